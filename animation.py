@@ -1,19 +1,101 @@
-import open3d as o3d
+import argparse
 import os
+import queue
+import threading
 import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import numpy as np
 
+# Depth colormap for clouds without colors, near to far: anchor colors spread evenly over the range
+DEPTH_COLORS = np.array([[0.19, 0.07, 0.23], [0.16, 0.47, 0.93], [0.10, 0.85, 0.60],
+                         [0.94, 0.80, 0.18], [0.72, 0.05, 0.02]])
 
-def display_pcd_animation(pcd_folder, display_time=0.5):
+
+class FramePrefetcher:
+    """
+    Loads point cloud files on a background thread into a bounded queue, so reading the next
+    frames from disk overlaps with rendering the current one.
+
+    The queue holds at most `prefetch` decoded frames, which bounds memory however far the loader
+    gets ahead. get() returns (index, path, points, colors) in file order; colors is None
+    for files without colors, and empty or unreadable files are skipped with a warning.
+
+    With voxelSize, every frame is voxel-downsampled on the loader thread (level of detail), which
+    cuts the points to upload and draw per frame for smooth playback of dense clouds.
+    """
+
+    def __init__(self, files, prefetch=8, voxelSize=None):
+        self.files = files
+        self.voxelSize = voxelSize
+        self.frames = queue.Queue(maxsize=max(1, prefetch))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._load, daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        # Waits for room in the queue, but gives up once playback has stopped
+        while not self.stopped.is_set():
+            try:
+                self.frames.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _load(self):
+        import open3d as o3d
+
+        for i, path in enumerate(self.files):
+            pcd = o3d.io.read_point_cloud(path)
+            if pcd.is_empty():
+                print(f"Warning: {path} is empty or invalid. Skipping.")
+                continue
+            if self.voxelSize:
+                pcd = pcd.voxel_down_sample(self.voxelSize)
+            colors = np.asarray(pcd.colors).copy() if pcd.has_colors() else None
+            if not self._put((i, path, np.asarray(pcd.points).copy(), colors)):
+                return
+        self._put(None)  # End of the files
+
+    def get(self, timeout=None):
+        """
+        Returns the next frame, None at the end, or raises queue.Empty if none arrived in time.
+        """
+        return self.frames.get(timeout=timeout)
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+def listPcdFiles(pcd_folder):
+    """
+    Returns the paths of the .pcd files in a folder, in frame order.
+    """
+    return sorted(os.path.join(pcd_folder, f) for f in os.listdir(pcd_folder) if f.endswith('.pcd'))
+
+
+def display_pcd_animation(pcd_folder, display_time=0.5, prefetch=8, dropFrames=True, voxelSize=None):
     """
     Displays an animation of .pcd files from a folder.
 
+    Frames are read ahead by a FramePrefetcher and shown on a fixed clock: frame i is due
+    i * display_time after the start. A frame whose time slot has already passed is dropped
+    (unless dropFrames is False), and when the loader falls behind the current frame is held,
+    so playback keeps real time instead of slowing down by the loading time of every frame.
+    The same geometry is updated in place every frame rather than removed and re-added.
+
     Parameters:
     - pcd_folder (str): Path to the folder containing .pcd files.
     - display_time (float): Time in seconds to display each .pcd file.
+    - prefetch (int): Number of frames loaded ahead of the one on screen.
+    - dropFrames (bool): Skip late frames to keep real time. False shows every frame.
+    - voxelSize (float, optional): Level of detail, voxel size in meters the frames are downsampled
+      to before they are shown. None shows the full clouds.
     """
-    # List all .pcd files in the folder
-    pcd_files = [os.path.join(pcd_folder, f) for f in os.listdir(pcd_folder) if f.endswith('.pcd')]
-    pcd_files.sort()  # Sort files to maintain sequential order
+    # List all .pcd files in the folder, sorted to maintain sequential order
+    pcd_files = listPcdFiles(pcd_folder)
 
     if not pcd_files:
         print(f"No .pcd files found in the folder: {pcd_folder}")
@@ -21,37 +103,223 @@ def display_pcd_animation(pcd_folder, display_time=0.5):
 
     print(f"Found {len(pcd_files)} .pcd files. Starting animation...")
 
+    import open3d as o3d  # The visualization stack is only loaded when an animation is shown
+
     # Create a visualizer
     vis = o3d.visualization.Visualizer()
     vis.create_window(window_name="PCD Animation", width=1600, height=1200)
 
-    for i, pcd_file in enumerate(pcd_files):
-        #print(f"Displaying file {i + 1}/{len(pcd_files)}: {pcd_file}")
+    loader = FramePrefetcher(pcd_files, prefetch, voxelSize)
+    pcd = None
+    shownFrames = 0
+    droppedFrames = 0
+    heldTime = 0.0
+    start = time.perf_counter()
+    windowOpen = True
 
-        # Load the point cloud
-        pcd = o3d.io.read_point_cloud(pcd_file)
-        if pcd.is_empty():
-            print(f"Warning: {pcd_file} is empty or invalid. Skipping.")
-            continue
+    try:
+        while windowOpen:
+            # Wait for the next frame, holding the current one (and keeping the window responsive)
+            waitStart = time.perf_counter()
+            while True:
+                try:
+                    frame = loader.get(timeout=0.01)
+                    break
+                except queue.Empty:
+                    windowOpen = vis.poll_events()
+                    if not windowOpen:
+                        frame = None
+                        break
+            if frame is None:
+                break
+            if pcd is not None:
+                heldTime += time.perf_counter() - waitStart  # The previous frame's slot is already over
 
-        # Add the point cloud to the visualizer
-        vis.clear_geometries()
-        vis.add_geometry(pcd)
+            i, _, points, colors = frame
+            due = start + i * display_time
+            now = time.perf_counter()
+            if dropFrames and pcd is not None and now > due + display_time:
+                droppedFrames += 1  # Its slot is over, showing it would only delay the next one
+                continue
 
-        # Update the visualizer
-        vis.poll_events()
-        vis.update_renderer()
+            # Update the point cloud on screen in place
+            if pcd is None:
+                pcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points))
+                if colors is not None:
+                    pcd.colors = o3d.utility.Vector3dVector(colors)
+                vis.add_geometry(pcd)
+                start = now - i * display_time  # Start the clock at the first frame shown
+            else:
+                pcd.points = o3d.utility.Vector3dVector(points)
+                if colors is not None:
+                    pcd.colors = o3d.utility.Vector3dVector(colors)
+                vis.update_geometry(pcd)
+            shownFrames += 1
 
-        # Wait for the specified time
-        time.sleep(display_time)
+            # Update the visualizer, then wait for the end of this frame's slot
+            windowOpen = vis.poll_events()
+            vis.update_renderer()
+            slotEnd = start + (i + 1) * display_time
+            while windowOpen and time.perf_counter() < slotEnd:
+                time.sleep(min(0.005, max(0.0, slotEnd - time.perf_counter())))
+                windowOpen = vis.poll_events()
+    finally:
+        loader.stop()
 
-    print("Animation complete. Closing visualizer.")
+    elapsed = time.perf_counter() - start
+    print(f"Animation complete: {shownFrames} frames shown, {droppedFrames} dropped, "
+          f"{heldTime:.1f} s held waiting for frames, {shownFrames / elapsed if elapsed > 0 else 0:.1f} fps. "
+          f"Closing visualizer.")
     vis.destroy_window()
 
 
+def sensorView(points, width, height, margin=0.1):
+    """
+    Fits a pinhole camera at the sensor origin, looking along +Z like the L515, to a frame's points
+    so they fill the image. Image X and Y follow the point X and Y, as in the camera's own image.
+
+    Returns:
+    - dict with the focal lengths 'fx', 'fy', principal point 'cx', 'cy' (pixels) and the depth
+      range 'near', 'far' of the depth colormap. Plain values, so it can be sent to worker processes.
+    """
+    points = points[points[:, 2] > 0]
+    # Percentiles keep single stray points from shrinking the object
+    low, high = np.percentile(points[:, :2] / points[:, 2:], [1, 99], axis=0)
+    near, far = np.percentile(points[:, 2], [1, 99])
+    span = np.maximum(high - low, 1e-6)
+    focal = (1 - 2 * margin) * min(width / span[0], height / span[1])
+    return {'fx': focal, 'fy': focal, 'cx': width / 2 - focal * (low[0] + high[0]) / 2,
+            'cy': height / 2 - focal * (low[1] + high[1]) / 2, 'near': near, 'far': max(far, near + 1e-6)}
+
+
+def renderPoints(points, colors, view, width, height, pointSize=2, background=(255, 255, 255)):
+    """
+    Renders points as square splats of pointSize pixels with a z-buffer, entirely in NumPy, so
+    frames can be drawn on machines without a display or GPU.
+
+    Parameters:
+    - points (np.array): (N, 3) points.
+    - colors (np.array, optional): (N, 3) colors in [0, 1]. None colors the points by depth.
+    - view (dict): Camera, see sensorView.
+
+    Returns:
+    - np.array: (height, width, 3) uint8 image.
+    """
+    image = np.empty((height, width, 3), dtype=np.uint8)
+    image[:] = background
+    inFront = points[:, 2] > 0
+    points = points[inFront]
+    if colors is None:
+        depth = np.clip((points[:, 2] - view['near']) / (view['far'] - view['near']), 0.0, 1.0)
+        anchors = np.linspace(0.0, 1.0, len(DEPTH_COLORS))
+        colors = np.stack([np.interp(depth, anchors, DEPTH_COLORS[:, c]) for c in range(3)], axis=1)
+    else:
+        colors = colors[inFront]
+    colors = (np.clip(colors, 0.0, 1.0) * 255).astype(np.uint8)
+
+    u = np.floor(view['fx'] * points[:, 0] / points[:, 2] + view['cx'] - pointSize / 2).astype(np.int64)
+    v = np.floor(view['fy'] * points[:, 1] / points[:, 2] + view['cy'] - pointSize / 2).astype(np.int64)
+    offsets = np.arange(pointSize)
+    u = (u[:, None, None] + offsets[None, None, :]).reshape(len(points), -1)
+    v = (v[:, None, None] + offsets[None, :, None]).reshape(len(points), -1)
+    visible = (u >= 0) & (u < width) & (v >= 0) & (v < height)
+    pixels = (v * width + u)[visible]
+    owners = np.nonzero(visible)[0]
+
+    # Nearest point per pixel: sort by pixel, then depth, and keep the first of every pixel
+    order = np.lexsort((points[owners, 2], pixels))
+    pixels = pixels[order]
+    first = np.ones(len(pixels), dtype=bool)
+    first[1:] = pixels[1:] != pixels[:-1]
+    image.reshape(-1, 3)[pixels[first]] = colors[owners[order][first]]
+    return image
+
+
+def _renderFile(path, outputPath, view, width, height, voxelSize, pointSize):
+    import open3d as o3d
+
+    pcd = o3d.io.read_point_cloud(path)
+    if voxelSize and not pcd.is_empty():
+        pcd = pcd.voxel_down_sample(voxelSize)
+    colors = np.asarray(pcd.colors) if pcd.has_colors() else None
+    image = renderPoints(np.asarray(pcd.points), colors, view, width, height, pointSize)
+    return o3d.io.write_image(outputPath, o3d.geometry.Image(image))
+
+
+def render_pcd_frames(pcd_folder, output_folder, width=1600, height=1200, voxelSize=None, pointSize=2,
+                      workers=1):
+    """
+    Renders the .pcd files of a folder offscreen to a numbered PNG sequence (frame_000000.png, ...),
+    without a window, display or GPU, e.g. to review a run on a server. The PNGs can be turned into
+    a video with `ffmpeg -framerate 30 -i frame_%06d.png -pix_fmt yuv420p animation.mp4`.
+
+    All frames share one camera at the sensor, fitted to the first non-empty frame (see sensorView),
+    and frames are independent, so they are rendered in parallel.
+
+    Parameters:
+    - pcd_folder (str): Path to the folder containing .pcd files.
+    - output_folder (str): Folder for the PNG files.
+    - width, height (int): Image size in pixels.
+    - voxelSize (float, optional): Voxel-downsample the frames before rendering, see display_pcd_animation.
+    - pointSize (int): Size of a point's square in pixels.
+    - workers (int): Worker processes, None uses one per CPU core.
+
+    Returns:
+    - list of str: Paths of the written images.
+    """
+    pcd_files = listPcdFiles(pcd_folder)
+    if not pcd_files:
+        print(f"No .pcd files found in the folder: {pcd_folder}")
+        return []
+    os.makedirs(output_folder, exist_ok=True)
+
+    import open3d as o3d
+
+    view = None
+    for path in pcd_files:
+        points = np.asarray(o3d.io.read_point_cloud(path).points)
+        if len(points) and np.any(points[:, 2] > 0):
+            view = sensorView(points, width, height)
+            break
+    if view is None:
+        print(f"All .pcd files in {pcd_folder} are empty.")
+        return []
+
+    print(f"Rendering {len(pcd_files)} frames to {output_folder}...")
+    start = time.perf_counter()
+    outputFiles = [os.path.join(output_folder, f"frame_{i:06d}.png") for i in range(len(pcd_files))]
+    render = partial(_renderFile, view=view, width=width, height=height, voxelSize=voxelSize, pointSize=pointSize)
+    if workers == 1:
+        written = list(map(render, pcd_files, outputFiles))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, min(16, len(pcd_files) // ((workers or os.cpu_count() or 1) * 4)))
+            written = list(executor.map(render, pcd_files, outputFiles, chunksize=chunksize))
+
+    elapsed = time.perf_counter() - start
+    failed = len(written) - sum(written)
+    print(f"Rendered {sum(written)} frames in {elapsed:.1f} s ({sum(written) / elapsed if elapsed > 0 else 0:.1f} fps)"
+          + (f", {failed} failed." if failed else "."))
+    return [path for path, ok in zip(outputFiles, written) if ok]
+
+
 if __name__ == "__main__":
-    # Replace with your folder containing .pcd files
-    pcd_folder = "/Users/lukebray/PycharmProjects/LASER2/OutputPCD/Test1"
-    display_time = 0.0333333  # Time in seconds to display each point cloud
+    parser = argparse.ArgumentParser(description="Play back a folder of filtered .pcd frames, or render it to PNGs.")
+    parser.add_argument("pcd_folder", help="Folder containing the .pcd files")
+    parser.add_argument("--display-time", type=float, default=0.0333333,
+                        help="Seconds each frame is shown (default: 30 fps)")
+    parser.add_argument("--voxel-size", type=float,
+                        help="Voxel-downsample the frames to this size in meters for smoother playback")
+    parser.add_argument("--render", metavar="OUTPUT_FOLDER",
+                        help="Render the frames offscreen to PNGs in this folder instead of showing them")
+    parser.add_argument("--size", type=int, nargs=2, default=(1600, 1200), metavar=("WIDTH", "HEIGHT"),
+                        help="Rendered image size (default: 1600 1200)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Worker processes for rendering, 0 uses one per core (default: 1)")
+    args = parser.parse_args()
 
-    display_pcd_animation(pcd_folder, display_time)
\ No newline at end of file
+    if args.render:
+        render_pcd_frames(args.pcd_folder, args.render, *args.size, voxelSize=args.voxel_size,
+                          workers=args.workers or None)
+    else:
+        display_pcd_animation(args.pcd_folder, args.display_time, voxelSize=args.voxel_size)
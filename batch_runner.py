@@ -0,0 +1,172 @@
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from folder_processor import limitWorkerThreads, processFolder
+from metadata_parser import timeStamps
+from pipeline_metrics import RunMetrics
+from results_store import saveResults
+
+# Columns of the combined CSV summary, one row per test
+SUMMARY_COLUMNS = ["test", "status", "frames", "valid_frames", "rpm", "width_cm", "height_cm", "depth_cm",
+                   "overall_average_z", "wall_time_s", "results_file", "error"]
+
+
+def findTests(testDirs):
+    """
+    Resolves the test directories given on the command line. A directory is a test if it has a
+    ply_files folder; a directory without one is searched one level down, so /Data runs every
+    /Data/TestN inside it.
+
+    Returns:
+    - list of (str, str): Test name and test directory, sorted by name.
+    """
+    tests = {}
+    for testDir in testDirs:
+        testDir = os.path.abspath(testDir)
+        if os.path.isdir(os.path.join(testDir, "ply_files")):
+            tests[os.path.basename(testDir)] = testDir
+            continue
+        for entry in os.scandir(testDir):
+            if entry.is_dir() and os.path.isdir(os.path.join(entry.path, "ply_files")):
+                tests[entry.name] = entry.path
+    return sorted(tests.items())
+
+
+def runTest(testName, testDir, outputRoot, executor, workers, dynamic_z_offset=0.5,
+            exportPCD=False, useCache=True, filterOptions=None, chunkSize=None):
+    """
+    Runs one test folder (ply_files + txt_files) through metadata parsing, processFolder and
+    saveResults, with its frames on the shared executor. With chunkSize, processFolder writes the
+    results file itself in windows of that many frames (see processFolder's chunked mode).
+
+    Returns:
+    - dict: Summary row of the test, see SUMMARY_COLUMNS.
+    """
+    start = time.perf_counter()
+    testOutput = os.path.join(outputRoot, testName)
+    os.makedirs(testOutput, exist_ok=True)
+    summary = {'test': testName, 'status': "ok", 'frames': 0, 'error': ""}
+
+    try:
+        metadataFolder = os.path.join(testDir, "txt_files")
+        timestamps = timeStamps(metadataFolder, indexFile=os.path.join(testOutput, "metadata_index.npz"))
+        resultsFile = os.path.join(testOutput, "results.laser")
+        resultsMetadata = {
+            'test_number': testName,
+            'ply_folder': os.path.join(testDir, "ply_files"),
+            'metadata_folder': metadataFolder,
+            'dynamic_z_offset': dynamic_z_offset,
+        }
+        metrics = RunMetrics(maxSamples=10000 if chunkSize else None)
+        results = processFolder(
+            folderPath=os.path.join(testDir, "ply_files"),
+            outputFolder=os.path.join(testOutput, "filtered"),
+            timestamps=timestamps,
+            dynamic_z_offset=dynamic_z_offset,
+            workers=workers,
+            fileExtension=".ply",
+            pcdExportFolder=os.path.join(testOutput, "pcd") if exportPCD else None,
+            cacheFolder=os.path.join(testOutput, "cache") if useCache else None,
+            filterOptions=filterOptions,
+            metrics=metrics,
+            executor=executor,
+            showProgress=False,
+            verbose=False,  # Reports of concurrent tests would interleave, the summary row has the results
+            chunkSize=chunkSize,
+            resultsFile=resultsFile if chunkSize else None,
+            resultsMetadata=resultsMetadata
+        )
+        if not chunkSize:
+            saveResults(resultsFile, results, timestamps, metadata=resultsMetadata)
+
+        width, height, depth = results['scaled_dimensions_cm']
+        summary.update(frames=len(results['normal_vectors']), valid_frames=int(results['valid'].sum()),
+                       rpm=float(results['rpm']), width_cm=float(width), height_cm=float(height),
+                       depth_cm=float(depth), overall_average_z=float(results['overall_average_z']),
+                       results_file=resultsFile)
+    except Exception as error:
+        # One broken test folder should not stop the rest of the batch
+        summary.update(status="failed", error=f"{type(error).__name__}: {error}")
+
+    summary['wall_time_s'] = time.perf_counter() - start
+    print(f"[{testName}] {summary['status']} in {summary['wall_time_s']:.1f} s"
+          + (f", RPM {summary['rpm']:.2f}, {summary['valid_frames']} of {summary['frames']} frames valid"
+             if summary['status'] == "ok" else f": {summary['error']}"))
+    return summary
+
+
+def runBatch(testDirs, outputRoot, workers=None, maxConcurrentTests=2, **kwargs):
+    """
+    Processes many test folders on one shared worker pool.
+
+    All frames of all running tests go to the same ProcessPoolExecutor, so the total wall time
+    depends on the number of frames and cores rather than on the number of tests. At most
+    maxConcurrentTests tests are in flight at once, which bounds the memory used for queued frames
+    and results while still keeping the pool busy when a test's frames run out.
+
+    Parameters:
+    - testDirs (list): Test directories, or folders containing them (see findTests).
+    - outputRoot (str): Folder for the per-test outputs and the combined summary.
+    - workers (int, optional): Worker processes in the shared pool, None uses one per CPU core.
+    - maxConcurrentTests (int): Number of tests scheduled on the pool at the same time.
+    - kwargs: Passed on to runTest (dynamic_z_offset, exportPCD, useCache, filterOptions, chunkSize).
+
+    Returns:
+    - list of dict: Summary rows, in test name order.
+    """
+    tests = findTests(testDirs)
+    os.makedirs(outputRoot, exist_ok=True)
+    print(f"Running {len(tests)} tests, {maxConcurrentTests} at a time, "
+          f"on {workers or os.cpu_count()} worker processes...")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=limitWorkerThreads) as executor, \
+            ThreadPoolExecutor(max_workers=maxConcurrentTests) as scheduler:
+        futures = [scheduler.submit(runTest, testName, testDir, outputRoot, executor, workers, **kwargs)
+                   for testName, testDir in tests]
+        summaries = [future.result() for future in futures]
+
+    writeSummary(summaries, outputRoot)
+    failed = sum(summary['status'] != "ok" for summary in summaries)
+    print(f"\nBatch finished in {time.perf_counter() - start:.1f} s: "
+          f"{len(summaries) - failed} tests ok, {failed} failed.")
+    return summaries
+
+
+def writeSummary(summaries, outputRoot):
+    """
+    Writes the combined summary of a batch as batch_summary.json and batch_summary.csv.
+    """
+    with open(os.path.join(outputRoot, "batch_summary.json"), 'w') as file:
+        json.dump(summaries, file, indent=2, default=lambda value: np.asarray(value).tolist())
+
+    with open(os.path.join(outputRoot, "batch_summary.csv"), 'w', newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        for summary in summaries:
+            writer.writerow({column: summary.get(column, "") for column in SUMMARY_COLUMNS})
+    print(f"Batch summary saved to: {os.path.join(outputRoot, 'batch_summary.csv')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process many L515 test folders on one shared worker pool.")
+    parser.add_argument("test_dirs", nargs="+",
+                        help="Test folders with ply_files and txt_files, or folders containing them")
+    parser.add_argument("--output-root", required=True, help="Folder for the per-test outputs and the summary")
+    parser.add_argument("--workers", type=int, help="Worker processes in the shared pool (default: one per core)")
+    parser.add_argument("--max-concurrent-tests", type=int, default=2,
+                        help="Tests scheduled on the pool at the same time (default: 2)")
+    parser.add_argument("--dynamic-z-offset", type=float, default=0.5, help="Offset for the dynamic Z filter")
+    parser.add_argument("--export-pcd", action="store_true", help="Also keep a PCD copy of every raw PLY frame")
+    parser.add_argument("--no-cache", action="store_true", help="Do not reuse per-frame results from earlier runs")
+    parser.add_argument("--chunk-size", type=int,
+                        help="Process and store frames in windows of this many frames, for very long captures")
+    args = parser.parse_args()
+
+    runBatch(args.test_dirs, args.output_root, workers=args.workers,
+             maxConcurrentTests=args.max_concurrent_tests, dynamic_z_offset=args.dynamic_z_offset,
+             exportPCD=args.export_pcd, useCache=not args.no_cache, chunkSize=args.chunk_size)
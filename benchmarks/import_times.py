@@ -0,0 +1,78 @@
+"""
+Measures the startup cost of the pipeline's entry points: the import time of each module in a
+fresh interpreter, its slowest imported packages and whether it pulls in open3d.
+
+Run from the repository root:
+    python -m benchmarks.import_times
+    python -m benchmarks.import_times main batch_runner --repeat 5
+"""
+import argparse
+import re
+import subprocess
+import sys
+import numpy as np
+
+# Modules whose startup matters: CLI entry points and what headless tools import
+DEFAULT_MODULES = ["main", "batch_runner", "live_processor", "folder_processor", "metadata_parser",
+                   "results_store", "rotation_calculations", "animation"]
+
+# Lines of `python -X importtime`: "import time: self [us] | cumulative | imported package"
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)")
+
+
+def measureImport(module, startupPackages=()):
+    """
+    Imports the module in a new interpreter with -X importtime.
+
+    Parameters:
+    - module (str): Module to import, or "" for the bare interpreter startup.
+    - startupPackages (set): Packages the interpreter loads on its own, left out of the result.
+
+    Returns:
+    - total (float): Cumulative import time of the module in seconds.
+    - packages (dict): Cumulative seconds of every top-level package it imported.
+    """
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}" if module else "pass"],
+                               capture_output=True, text=True)
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr.strip().splitlines()[-1]}")
+
+    total = 0.0
+    packages = {}
+    for line in completed.stderr.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative = int(match.group(2)) / 1e6
+        name = match.group(3)
+        if name == module:
+            total = cumulative
+        else:
+            # The outermost import of a package includes all of its submodules
+            package = name.split(".")[0]
+            if package in startupPackages:
+                continue
+            packages[package] = max(packages.get(package, 0.0), cumulative)
+    return total, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the pipeline modules.")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules to import")
+    parser.add_argument("--repeat", type=int, default=3, help="Imports per module, the median is shown")
+    parser.add_argument("--top", type=int, default=3, help="Slowest imported packages to list")
+    args = parser.parse_args()
+
+    startupPackages = set(measureImport("")[1])
+    print(f"{'module':<24}{'import (ms)':>12}{'open3d':>8}  slowest imports")
+    for module in args.modules:
+        runs = [measureImport(module, startupPackages) for _ in range(args.repeat)]
+        total = np.median([seconds for seconds, _ in runs])
+        packages = runs[-1][1]
+        slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        print(f"{module:<24}{total * 1000:>12.0f}{'yes' if 'open3d' in packages else 'no':>8}  "
+              + ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in slowest))
+
+
+if __name__ == "__main__":
+    main()
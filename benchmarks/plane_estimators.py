@@ -0,0 +1,116 @@
+"""
+Compares the plane-normal estimators on synthetic rotating-box frames: time per frame, angle to the
+true face normal and angle to the normal of the current method (Open3D RANSAC, 1000 iterations).
+
+Run from the repository root:
+    python -m benchmarks.plane_estimators --densities low medium --frames 20 --output planes.json
+"""
+import argparse
+import json
+import time
+import numpy as np
+import open3d as o3d
+from benchmarks.run_benchmarks import gitCommit
+from benchmarks.synthetic_frames import DENSITIES, makeFrame, makeTimestamps
+from point_cloud_filtering import cleanAndClusterPointCloud
+from rotation_calculations import get_plane_normal
+
+# Estimator settings to compare, passed to get_plane_normal. 'ransac' is the current default.
+ESTIMATORS = {
+    'ransac': {'method': 'ransac'},
+    'ransac_200': {'method': 'ransac', 'num_iterations': 200},
+    'fast': {'method': 'fast'},
+    'fast_2k_sample': {'method': 'fast', 'sample_size': 2000},
+    'fast_early_stop': {'method': 'fast', 'min_inlier_ratio': 0.3},
+    'fast_no_refine': {'method': 'fast', 'refine': False},
+}
+
+
+def angleDegrees(a, b):
+    """
+    Angle between two plane normals in degrees, ignoring their sign.
+    """
+    return float(np.degrees(np.arccos(np.clip(abs(np.dot(a, b)), 0.0, 1.0))))
+
+
+def benchmarkEstimators(numPoints, numFrames, estimators, seed=0):
+    """
+    Cleans numFrames synthetic frames once, then runs every estimator on the same cleaned clouds.
+
+    Returns:
+    - dict mapping each estimator name to its median time and its median/p90 angle errors (degrees)
+      against the true normal and against the 'ransac' estimator.
+    """
+    timestamps = makeTimestamps(numFrames, seed=seed)
+    clouds = []
+    truths = []
+    for i, timestamp in enumerate(timestamps):
+        points, truth = makeFrame(timestamp, numPoints, seed=seed + i)
+        cleanedPcd, _, _ = cleanAndClusterPointCloud(o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points)),
+                                                     dynamic_z_offset=0.5, eps=0.2, minPoints=1000,
+                                                     minClusterSize=500, dbscanVoxelSize=0.02)
+        if cleanedPcd is not None:
+            clouds.append(cleanedPcd)
+            truths.append(truth['normal'])
+
+    normals = {}
+    times = {}
+    for name, options in estimators.items():
+        normals[name] = []
+        times[name] = []
+        for i, cloud in enumerate(clouds):
+            o3d.utility.random.seed(i)
+            start = time.perf_counter()
+            normals[name].append(get_plane_normal(cloud, seed=i, **options))
+            times[name].append(time.perf_counter() - start)
+
+    reference = normals.get('ransac')
+    results = {}
+    for name in estimators:
+        truthErrors = [angleDegrees(n, t) for n, t in zip(normals[name], truths)]
+        result = {
+            'median_time_s': float(np.median(times[name])),
+            'truth_error_median_deg': float(np.median(truthErrors)),
+            'truth_error_p90_deg': float(np.percentile(truthErrors, 90)),
+        }
+        if reference is not None:
+            referenceErrors = [angleDegrees(n, r) for n, r in zip(normals[name], reference)]
+            result['ransac_error_median_deg'] = float(np.median(referenceErrors))
+            result['ransac_error_p90_deg'] = float(np.percentile(referenceErrors, 90))
+        results[name] = result
+    return {'points': numPoints, 'frames': len(clouds), 'cleaned_points_median': float(np.median(
+        [len(cloud.points) for cloud in clouds])) if clouds else 0.0, 'estimators': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the plane-normal estimators on synthetic frames.")
+    parser.add_argument("--densities", nargs="+", default=["low", "medium"], choices=sorted(DENSITIES),
+                        help="Point density levels to run (default: low medium)")
+    parser.add_argument("--frames", type=int, default=20, help="Frames per density (default: 20)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = {'commit': gitCommit(), 'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+              'estimators': ESTIMATORS, 'results': {}}
+
+    for density in args.densities:
+        result = benchmarkEstimators(DENSITIES[density], args.frames, ESTIMATORS)
+        report['results'][density] = result
+        print(f"{density} density ({result['points']} points, "
+              f"{result['cleaned_points_median']:.0f} after cleaning, {result['frames']} frames):")
+        print(f"  {'estimator':<18}{'time (ms)':>10}{'speedup':>9}{'vs truth p50/p90 (deg)':>26}"
+              f"{'vs ransac p50/p90 (deg)':>26}")
+        baseline = result['estimators']['ransac']['median_time_s']
+        for name, stats in result['estimators'].items():
+            print(f"  {name:<18}{stats['median_time_s'] * 1000:>10.2f}{baseline / stats['median_time_s']:>8.1f}x"
+                  f"{stats['truth_error_median_deg']:>16.2f} / {stats['truth_error_p90_deg']:<7.2f}"
+                  f"{stats['ransac_error_median_deg']:>16.2f} / {stats['ransac_error_p90_deg']:<7.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
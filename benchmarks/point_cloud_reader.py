@@ -0,0 +1,130 @@
+"""
+Compares loading frames with Open3D (read_point_cloud, then NumPy on the points) against the
+memory-mapped reader (point_cloud_reader.readXYZ): time to load a frame, time to load it and run the
+NaN/Z pre-filter the pipeline starts with, and the memory allocated per frame.
+
+Frames are written once in two binary PLY layouts: 'l515' (float32 xyz followed by RGB, like the
+camera export) and 'open3d' (float64 xyz, as Open3D and benchmarks/run_benchmarks.py write them).
+They are read back from the page cache, so the times show decoding cost rather than disk speed.
+
+Run from the repository root:
+    python -m benchmarks.point_cloud_reader --densities low medium high --frames 10 --output reader.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import open3d as o3d
+from benchmarks.run_benchmarks import gitCommit
+from benchmarks.synthetic_frames import DENSITIES, makeFrame
+from point_cloud_filtering import preFilterMask
+from point_cloud_reader import readXYZ
+
+
+def writeL515Frame(path, points):
+    """
+    Writes points as a binary PLY in the L515 export layout: float32 x, y, z and uchar red, green, blue.
+    """
+    records = np.zeros(len(points), dtype=[('xyz', '<f4', (3,)), ('rgb', 'u1', (3,))])
+    records['xyz'] = points
+    header = (f"ply\nformat binary_little_endian 1.0\nelement vertex {len(points)}\n"
+              "property float x\nproperty float y\nproperty float z\n"
+              "property uchar red\nproperty uchar green\nproperty uchar blue\nend_header\n")
+    with open(path, 'wb') as file:
+        file.write(header.encode('ascii'))
+        file.write(records.tobytes())
+
+
+def loadOpen3D(path):
+    # Open3D's buffer lives on the C++ heap, tracemalloc does not see it
+    points = np.asarray(o3d.io.read_point_cloud(path).points)
+    return points, points.nbytes
+
+
+def loadMapped(path):
+    return readXYZ(path), 0
+
+
+LOADERS = {'open3d': loadOpen3D, 'mmap': loadMapped}
+
+
+def measure(loader, path):
+    """
+    Loads one frame, then loads it again and pre-filters it like cleanAndClusterPointCloud.
+
+    Returns:
+    - (load seconds, load + pre-filter seconds, bytes allocated by load + pre-filter)
+    """
+    start = time.perf_counter()
+    loader(path)
+    loadTime = time.perf_counter() - start
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    points, untracedBytes = loader(path)
+    keep = preFilterMask(points, 0.5)
+    filteredPoints = np.asarray(points[keep], dtype=np.float64)
+    prefilterTime = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del filteredPoints
+    return loadTime, prefilterTime, peak + untracedBytes
+
+
+def benchmarkReader(numPoints, numFrames, seed=0):
+    """
+    Returns the median load time, load + pre-filter time and allocated bytes per frame of every
+    loader on every file layout.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as frameFolder:
+        files = {'l515': [], 'open3d': []}
+        for i in range(numFrames):
+            points, _ = makeFrame(i / 30.0, numPoints, seed=seed + i)
+            files['l515'].append(os.path.join(frameFolder, f"l515_{i:05d}.ply"))
+            writeL515Frame(files['l515'][-1], points)
+            files['open3d'].append(os.path.join(frameFolder, f"open3d_{i:05d}.ply"))
+            o3d.io.write_point_cloud(files['open3d'][-1], o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points)))
+
+        for layout, paths in files.items():
+            results[layout] = {}
+            for name, loader in LOADERS.items():
+                loadTimes, prefilterTimes, allocated = zip(*(measure(loader, path) for path in paths))
+                results[layout][name] = {
+                    'load_median_s': float(np.median(loadTimes)),
+                    'load_prefilter_median_s': float(np.median(prefilterTimes)),
+                    'allocated_median_bytes': float(np.median(allocated)),
+                }
+    return {'points': numPoints, 'frames': numFrames, 'layouts': results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the Open3D and memory-mapped frame loaders.")
+    parser.add_argument("--densities", nargs="+", default=["low", "medium"], choices=sorted(DENSITIES),
+                        help="Point density levels to run (default: low medium)")
+    parser.add_argument("--frames", type=int, default=10, help="Frames per density (default: 10)")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = {'commit': gitCommit(), 'date': time.strftime("%Y-%m-%dT%H:%M:%S"), 'results': {}}
+    for density in args.densities:
+        result = benchmarkReader(DENSITIES[density], args.frames)
+        report['results'][density] = result
+        print(f"{density} density ({result['points']} points, {result['frames']} frames):")
+        print(f"  {'layout':<8}{'loader':<8}{'load (ms)':>11}{'+ prefilter (ms)':>18}{'allocated (MB)':>16}")
+        for layout, loaders in result['layouts'].items():
+            for name, stats in loaders.items():
+                print(f"  {layout:<8}{name:<8}{stats['load_median_s'] * 1000:>11.2f}"
+                      f"{stats['load_prefilter_median_s'] * 1000:>18.2f}{stats['allocated_median_bytes'] / 1e6:>16.2f}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
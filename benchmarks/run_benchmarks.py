@@ -0,0 +1,162 @@
+"""
+Benchmarks the filtering pipeline on synthetic rotating-box frames with known size and RPM.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks --densities low medium --frames 30 --output bench.json
+    python -m benchmarks.run_benchmarks --output new.json --compare bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import numpy as np
+import open3d as o3d
+from benchmarks.synthetic_frames import DENSITIES, makeFrame, makeTimestamps
+from point_cloud_filtering import cleanAndClusterPointCloud
+from rotation_calculations import get_plane_normal, calculate_rpm
+
+
+def gitCommit():
+    """
+    Returns the current commit hash, or None outside a git checkout.
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmarkDensity(numPoints, numFrames, rpm, filterOptions, seed=0, planeOptions=None):
+    """
+    Runs numFrames synthetic frames through cleanAndClusterPointCloud, get_plane_normal and
+    calculate_rpm, timing every stage and comparing the results to the ground truth.
+
+    Returns:
+    - dict with the per-stage median/max times, the median relative extent error and the RPM error.
+    """
+    timestamps = makeTimestamps(numFrames, seed=seed)
+    stageTimes = {}
+    extentErrors = []
+    normals = []
+    failedFrames = 0
+
+    with tempfile.TemporaryDirectory() as frameFolder:
+        for i, timestamp in enumerate(timestamps):
+            points, truth = makeFrame(timestamp, numPoints, rpm=rpm, seed=seed + i)
+            # Frames go through a binary PLY file, like the camera export, so loading is timed too
+            frameFile = os.path.join(frameFolder, f"frame_{i:05d}.ply")
+            o3d.io.write_point_cloud(frameFile, o3d.geometry.PointCloud(o3d.utility.Vector3dVector(points)))
+
+            stats = {}
+            frameStart = time.perf_counter()
+            cleanedPcd, _, dimensions = cleanAndClusterPointCloud(frameFile, dynamic_z_offset=0.5, eps=0.2,
+                                                                  minPoints=1000, minClusterSize=500,
+                                                                  stats=stats, **filterOptions)
+            if cleanedPcd is None:
+                failedFrames += 1
+                normals.append(np.zeros(3))
+                continue
+
+            planeStart = time.perf_counter()
+            o3d.utility.random.seed(i)
+            normals.append(get_plane_normal(cleanedPcd, seed=i, **(planeOptions or {})))
+            end = time.perf_counter()
+
+            for stage, seconds in dict(stats['timings'], plane_fit=end - planeStart, total=end - frameStart).items():
+                stageTimes.setdefault(stage, []).append(seconds)
+
+            # OBB axes are in no particular order, compare sorted extents
+            extentErrors.append(np.abs(np.sort(dimensions) - np.sort(truth['dimensions'])) / np.sort(truth['dimensions']))
+
+    rpmStart = time.perf_counter()
+    computedRpm, _ = calculate_rpm(np.array(normals), timestamps)
+    rpmTime = time.perf_counter() - rpmStart
+
+    extentErrors = np.array(extentErrors).reshape(-1, 3)
+    return {
+        'points': numPoints,
+        'frames': numFrames,
+        'failed_frames': failedFrames,
+        'stage_median_s': {stage: float(np.median(times)) for stage, times in stageTimes.items()},
+        'stage_max_s': {stage: float(np.max(times)) for stage, times in stageTimes.items()},
+        'calculate_rpm_s': rpmTime,
+        'extent_median_relative_error': np.median(extentErrors, axis=0).tolist() if len(extentErrors) else None,
+        'rpm_true': rpm,
+        'rpm_computed': float(computedRpm),
+        'rpm_relative_error': abs(float(computedRpm) - rpm) / rpm,
+    }
+
+
+def compareResults(previous, current):
+    """
+    Prints the per-stage median times of two benchmark result files side by side.
+    """
+    print(f"\nComparing against {previous.get('commit') or 'previous run'}:")
+    for density, result in current['results'].items():
+        old = previous['results'].get(density)
+        if old is None:
+            continue
+        print(f"  {density} ({result['points']} points)")
+        for stage, seconds in result['stage_median_s'].items():
+            oldSeconds = old['stage_median_s'].get(stage)
+            if oldSeconds:
+                print(f"    {stage:<20} {oldSeconds * 1000:9.1f} ms -> {seconds * 1000:9.1f} ms "
+                      f"({oldSeconds / seconds if seconds else float('inf'):.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the point cloud pipeline on synthetic frames.")
+    parser.add_argument("--densities", nargs="+", default=["low", "medium"], choices=sorted(DENSITIES),
+                        help="Point density levels to run (default: low medium)")
+    parser.add_argument("--frames", type=int, default=30, help="Frames per density (default: 30)")
+    parser.add_argument("--rpm", type=float, default=10.0, help="Rotation speed of the synthetic box")
+    parser.add_argument("--dbscan-voxel-size", type=float, help="Benchmark the voxel-downsampled DBSCAN path")
+    parser.add_argument("--neighbor-index", action="store_true",
+                        help="Run the outlier filters on one shared KD-tree (neighbor_index.NeighborIndex)")
+    parser.add_argument("--plane-method", default="ransac", choices=["ransac", "fast"],
+                        help="Plane estimator for the normals, see benchmarks/plane_estimators.py")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Previous JSON results to compare against")
+    args = parser.parse_args()
+
+    filterOptions = {}
+    if args.dbscan_voxel_size:
+        filterOptions['dbscanVoxelSize'] = args.dbscan_voxel_size
+    if args.neighbor_index:
+        filterOptions['neighborIndex'] = True
+
+    report = {
+        'commit': gitCommit(),
+        'date': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'machine': platform.platform(),
+        'config': dict(vars(args), filter_options=filterOptions),
+        'results': {},
+    }
+
+    for density in args.densities:
+        print(f"Running {density} density ({DENSITIES[density]} points, {args.frames} frames)...")
+        result = benchmarkDensity(DENSITIES[density], args.frames, args.rpm, filterOptions,
+                                  planeOptions={'method': args.plane_method})
+        report['results'][density] = result
+
+        print(f"  total per frame: {result['stage_median_s'].get('total', float('nan')) * 1000:.1f} ms (median), "
+              f"extent error: {result['extent_median_relative_error']}, "
+              f"RPM {result['rpm_computed']:.2f} (true {result['rpm_true']:.2f}), "
+              f"failed frames: {result['failed_frames']}")
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compareResults(json.load(file), report)
+
+
+if __name__ == "__main__":
+    main()
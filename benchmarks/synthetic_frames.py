@@ -0,0 +1,94 @@
+import numpy as np
+
+# Total points per frame for the standard density levels
+DENSITIES = {
+    'low': 40000,
+    'medium': 100000,
+    'high': 250000,
+}
+
+
+def boxSurfacePoints(size, count, rng):
+    """
+    Samples points uniformly over the surface of an axis-aligned box centered at the origin.
+    Faces get points in proportion to their area, like a real scan at constant density.
+    """
+    size = np.asarray(size, dtype=float)
+    faceAreas = np.array([size[1] * size[2], size[0] * size[2], size[0] * size[1]])  # Faces normal to X, Y, Z
+    faceAxis = rng.choice(3, size=count, p=faceAreas / faceAreas.sum())
+
+    points = (rng.random((count, 3)) - 0.5) * size
+    points[np.arange(count), faceAxis] = rng.choice([-0.5, 0.5], size=count) * size[faceAxis]
+    return points
+
+
+def rotationAboutY(angle):
+    """
+    Rotation matrix for a rotation by angle (radians) about the camera's Y axis.
+    """
+    c, s = np.cos(angle), np.sin(angle)
+    return np.array([[c, 0.0, s], [0.0, 1.0, 0.0], [-s, 0.0, c]])
+
+
+def makeFrame(timestamp, numPoints, rpm=10.0, boxSize=(0.4, 0.3, 0.1), objectDistance=2.0,
+              noiseStd=0.001, nanFraction=0.02, seed=None):
+    """
+    Generates one L515-like frame: a box rotating about the Y axis in front of a near surface
+    (removed by the dynamic Z crop), a sparse back wall, scattered outliers and NaN points.
+
+    Parameters:
+    - timestamp (float): Frame time in seconds, sets the box's rotation angle.
+    - numPoints (int): Total points in the frame, half of them on the box.
+    - rpm (float): Rotation speed of the box.
+    - boxSize (tuple): Box dimensions in meters along X, Y, Z before rotation.
+    - objectDistance (float): Z of the box center in meters.
+    - noiseStd (float): Standard deviation of the Gaussian sensor noise in meters.
+    - nanFraction (float): Fraction of points replaced by NaN.
+    - seed (int, optional): Seed for the random generator.
+
+    Returns:
+    - points (np.array): (numPoints, 3) float64 array.
+    - truth (dict): Ground truth with 'dimensions', 'angle' and 'normal' of the largest face.
+    """
+    rng = np.random.default_rng(seed)
+    boxSize = np.asarray(boxSize, dtype=float)
+
+    numObject = numPoints // 2
+    numNear = numPoints // 5
+    numWall = numPoints // 5
+    numOutliers = numPoints - numObject - numNear - numWall
+
+    angle = 2 * np.pi * rpm / 60 * timestamp
+    rotation = rotationAboutY(angle)
+    objectPoints = boxSurfacePoints(boxSize, numObject, rng) @ rotation.T + [0.0, 0.0, objectDistance]
+
+    # A surface close to the camera, e.g. the table edge, removed by the dynamic Z crop
+    nearPoints = np.column_stack([rng.uniform(-1.0, 1.0, numNear), rng.uniform(-1.0, 1.0, numNear),
+                                  objectDistance - 1.0 + rng.uniform(0.0, 0.05, numNear)])
+    # A sparse back wall, below the DBSCAN density
+    wallPoints = np.column_stack([rng.uniform(-2.0, 2.0, numWall), rng.uniform(-1.5, 1.5, numWall),
+                                  np.full(numWall, objectDistance + 1.5)])
+    outliers = rng.uniform([-1.0, -1.0, objectDistance - 0.5], [1.0, 1.0, objectDistance + 1.0], (numOutliers, 3))
+
+    points = np.vstack([objectPoints, nearPoints, wallPoints, outliers])
+    points += rng.normal(0.0, noiseStd, points.shape)
+    points[rng.random(numPoints) < nanFraction] = np.nan
+    rng.shuffle(points)
+
+    # The largest face is the one RANSAC finds, its normal turns with the box
+    largestFace = np.argmin(boxSize)
+    truth = {
+        'dimensions': boxSize,
+        'angle': angle,
+        'normal': rotation[:, largestFace],
+    }
+    return points, truth
+
+
+def makeTimestamps(numFrames, fps=30.0, jitter=0.0005, seed=None):
+    """
+    Frame timestamps in seconds at the given frame rate, with a little Gaussian jitter.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(numFrames) / fps + rng.normal(0.0, jitter, numFrames)
+    return np.maximum.accumulate(timestamps)
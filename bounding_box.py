@@ -1,14 +1,31 @@
 import numpy as np
 
-def calculateBoundingBoxDimensions(pointCloud):
+def calculateBoundingBoxDimensions(pointCloud, sampleSize=None, seed=0):
     """
     Calculates the dimensions of the oriented bounding box around the given point cloud.
     Returns the bounding box and its dimensions.
+
+    With sampleSize set, the box axes are taken from Open3D's oriented bounding box of a random
+    subsample of at most sampleSize points (the hull and PCA behind it are the costly part), and
+    all points are then projected onto those axes, so the box still encloses the whole cloud.
+    The cost stays bounded however dense the cloud is.
     """
     if pointCloud.is_empty():
         print("Error: Point cloud is empty.")
         return None, None
 
-    bbox = pointCloud.get_oriented_bounding_box()
+    points = np.asarray(pointCloud.points)
+    if sampleSize is None or len(points) <= sampleSize:
+        bbox = pointCloud.get_oriented_bounding_box()
+    else:
+        import open3d as o3d
+
+        rng = np.random.default_rng(seed)
+        sample = points[rng.choice(len(points), sampleSize, replace=False)]
+        axes = np.asarray(o3d.geometry.OrientedBoundingBox.create_from_points(o3d.utility.Vector3dVector(sample)).R)
+        projected = points @ axes
+        low, high = projected.min(axis=0), projected.max(axis=0)
+        bbox = o3d.geometry.OrientedBoundingBox(axes @ ((low + high) / 2), axes, high - low)
+
     bboxSize = np.array(bbox.extent)  # Extent gives the length, width, and height of the OBB
     return bbox, bboxSize
@@ -0,0 +1,95 @@
+import numpy as np
+
+
+class DimensionAccumulator:
+    """
+    Running means of the per-frame dimensions and mean Z, with the filtered Y average of
+    remove_outliers_y estimated from a histogram of the Y extents, for runs too long to keep in memory.
+
+    Parameters:
+    - binWidth (float): Width of the Y histogram bins in meters.
+    """
+
+    def __init__(self, binWidth=1e-4):
+        self.binWidth = binWidth
+        self.frames = 0
+        self.dimensionSum = np.zeros(3)
+        self.zSum = 0.0
+        self.yCounts = np.zeros(0, dtype=np.int64)
+        self.ySums = np.zeros(0)
+
+    def add(self, dimensions, average_z):
+        """
+        Adds one frame's bounding box dimensions (X, Y, Z) and mean Z.
+        """
+        self.addMany(np.reshape(dimensions, (1, 3)), [average_z])
+
+    def addMany(self, dimensions, averageZ):
+        """
+        Adds a block of frames at once: an (N, 3) array of dimensions and N mean Z values.
+        """
+        dimensions = np.asarray(dimensions, dtype=float).reshape(-1, 3)
+        if len(dimensions) == 0:
+            return
+        self.frames += len(dimensions)
+        self.dimensionSum += dimensions.sum(axis=0)
+        self.zSum += float(np.sum(averageZ))
+
+        yValues = dimensions[:, 1]
+        bins = np.maximum(np.floor(yValues / self.binWidth).astype(np.int64), 0)
+        numBins = max(len(self.yCounts), int(bins.max()) + 1)
+        self.yCounts = np.pad(self.yCounts, (0, numBins - len(self.yCounts)))
+        self.ySums = np.pad(self.ySums, (0, numBins - len(self.ySums)))
+        self.yCounts += np.bincount(bins, minlength=numBins)
+        self.ySums += np.bincount(bins, weights=yValues, minlength=numBins)
+
+    def meanDimensions(self):
+        return self.dimensionSum / self.frames if self.frames else np.zeros(3)
+
+    def overallAverageZ(self):
+        return self.zSum / self.frames if self.frames else 0.0
+
+    def filteredYAverage(self):
+        """
+        Mean of the upper half of the Y extents. Within binWidth of remove_outliers_y unless values
+        equal to the median also fall below the middle, which remove_outliers_y keeps as well.
+        """
+        if self.frames == 0:
+            return 0.0
+
+        # The values at or above the median are the sorted values from index frames // 2 on: the
+        # bins after the one holding that value, plus the share of that bin's values from it on
+        cumulative = np.cumsum(self.yCounts)
+        middle = self.frames // 2
+        medianBin = np.searchsorted(cumulative, middle + 1)
+        aboveInBin = cumulative[medianBin] - middle
+        total = self.ySums[medianBin + 1:].sum() + self.ySums[medianBin] * aboveInBin / self.yCounts[medianBin]
+        return float(total / (self.frames - middle))
+
+    def summary(self, scalingFactor, filteredYAverage=None):
+        """
+        Returns the run's aggregates the way processFolder reports them.
+
+        Parameters:
+        - scalingFactor (callable): Maps the overall mean Z to the dimension scale factor,
+          e.g. folder_processor.scaling_factor.
+        - filteredYAverage (float, optional): Exact filtered Y average to use instead of the
+          histogram estimate, e.g. from remove_outliers_y when the Y extents are in memory.
+
+        Returns:
+        - dict with 'overall_average_z', 'filtered_y_average', 'average_dimensions' (Y replaced by
+          the filtered Y average), 'scale' and 'scaled_dimensions_cm'.
+        """
+        overall_average_z = self.overallAverageZ()
+        filtered_y_average = self.filteredYAverage() if filteredYAverage is None else float(filteredYAverage)
+        average_dimensions = self.meanDimensions()
+        if self.frames:
+            average_dimensions[1] = filtered_y_average
+        scale = scalingFactor(overall_average_z)
+        return {
+            'overall_average_z': overall_average_z,
+            'filtered_y_average': filtered_y_average,
+            'average_dimensions': average_dimensions,
+            'scale': scale,
+            'scaled_dimensions_cm': average_dimensions * scale * 100,
+        }
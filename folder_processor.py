@@ -1,8 +1,18 @@
 import os
+import time
 import numpy as np
-import open3d as o3d
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from point_cloud_filtering import cleanAndClusterPointCloud
-from rotation_calculations import get_plane_normal, calculate_rpm  # Import rotation functions
+from ply_to_pcd_converter import loadPLYFrame, pcdExportPath
+from frame_cache import frameCacheKey, loadCachedFrame, saveCachedFrame
+from dimension_stats import DimensionAccumulator
+from frame_quality import FrameQualityScorer
+from frame_tracking import FrameTracker
+from pipeline_metrics import RunMetrics
+from results_store import ResultsStore, runSummary
+from rotation_calculations import get_plane_normal, calculate_rpm, RPMEstimator  # Import rotation functions
 
 
 def remove_outliers_y(data):
@@ -15,6 +25,13 @@ def remove_outliers_y(data):
     return filtered_data, filtered_average
 
 
+def scaling_factor(overall_average_z):
+    """
+    Returns the factor converting bounding box dimensions to meters at the object's mean distance.
+    """
+    return -0.0287 * overall_average_z + 0.8376
+
+
 def update_loading_bar(processed, total):
     """
     Updates the loading bar with the current progress.
@@ -26,89 +43,399 @@ def update_loading_bar(processed, total):
     print(f"\r{bar}", end="", flush=True)
 
 
-def processFolder(folderPath, outputFolder, timestamps, dynamic_z_offset=0.5, calculateBoundingBox=True):
+# Parameters handed to cleanAndClusterPointCloud for every frame (dynamic_z_offset is set per run)
+FILTER_PARAMS = {
+    'useStatisticalFilter': True,
+    'useRadiusFilter': True,
+    'eps': 0.2,
+    'minPoints': 1000,
+    'minClusterSize': 500,
+    'finalRadiusFilter': True,
+    'neighborIndex': True,  # One shared KD-tree for the outlier filters, same points as Open3D's filters
+}
+
+# Plane estimator for the normal vectors, see rotation_calculations.get_plane_normal
+PLANE_PARAMS = {
+    'method': 'ransac',
+}
+
+
+def limitWorkerThreads():
+    """
+    ProcessPoolExecutor initializer giving Open3D's OpenMP loops (DBSCAN, the outlier filters) one
+    thread per worker, so a pool of N workers does not run N x N threads. Only takes effect if
+    open3d is first imported in the worker, which is the case unless the parent imported it before
+    the pool was forked.
+    """
+    os.environ['OMP_NUM_THREADS'] = '1'
+
+
+def mapInWindows(executor, function, windowSize, *iterables, **mapOptions):
+    """
+    Like executor.map, but submits the frames one window at a time, the next window while the
+    results of the current one are consumed. executor.map submits every frame up front and holds
+    all results that are ready before their turn, so memory would grow with the capture length.
+    """
+    iterators = [iter(values) for values in iterables]
+    pending = []
+    while True:
+        arguments = [list(islice(values, windowSize)) for values in iterators]
+        if not arguments[0]:
+            break
+        window = executor.map(function, *arguments, **mapOptions)
+        yield from pending
+        pending = window
+    yield from pending
+
+
+def processFrame(inputFile, filteredOutputFile, seed=None, dynamic_z_offset=0.5, pcdExportFolder=None,
+                 cacheFolder=None, filterOptions=None, tracker=None, planeOptions=None, queryThreads=-1):
+    """
+    Cleans, clusters and fits a plane to a single frame.
+    Runs in a worker process when processFolder is called with workers > 1, so it only
+    returns plain NumPy values.
+
+    Parameters:
+    - seed (int, optional): Seed for Open3D's random generator before the RANSAC plane fit.
+      processFolder passes the frame index so serial and parallel runs give identical normals.
+    - pcdExportFolder (str, optional): For PLY input, also write the decoded frame there as PCD.
+    - cacheFolder (str, optional): Folder of the per-frame result cache. A frame is only processed
+      if its cache entry is missing or was made from a different file content or different parameters.
+      Not used with a tracker, a tracked result also depends on the frames before it.
+    - filterOptions (dict, optional): Overrides or additions to FILTER_PARAMS, e.g.
+      {'dbscanVoxelSize': 0.02} for the voxel-downsampled DBSCAN fast path.
+    - tracker (FrameTracker, optional): Seeds the crop and the plane fit from the previous frame.
+      Frames must then be passed in order, in a single process.
+    - planeOptions (dict, optional): Overrides or additions to PLANE_PARAMS, e.g. {'method': 'fast'}
+      or {'method': 'fast', 'min_inlier_ratio': 0.3}. Not used with a tracker.
+    - queryThreads (int): Threads for the neighbor index queries (see cleanAndClusterPointCloud),
+      -1 uses all cores. processFolder passes 1 when frames run on a process pool. Does not change
+      the result, so it is not part of the cache key.
+
+    Returns:
+    - dict with:
+        - 'dimensions' (np.array): Bounding box dimensions, zeros if the frame failed.
+        - 'average_z' (float): Mean Z of the cleaned cloud, 0.0 if the frame failed.
+        - 'normal_vector' (np.array): Unit normal of the largest plane, zeros if the frame failed.
+        - 'point_count' (int): Number of points in the cleaned cloud.
+        - 'status' (str): 'ok', 'rejected' if the early rejection skipped the frame, or 'failed' if
+          no cluster was left after filtering.
+        - 'rejection_reason' (str): Why the frame was rejected (see earlyRejectionReason), '' otherwise.
+        - 'skipped_clusters' (int): Number of clusters dropped for being too small.
+        - 'min_bound', 'max_bound' (np.array): Axis-aligned bounds of the cleaned cloud.
+        - 'cached' (bool): True if the result came from the cache.
+        - 'stats' (dict): Per-stage timings and point counts (see cleanAndClusterPointCloud), with the
+          plane fit timed as 'plane_fit'. Missing for cached frames, which ran no stage.
+    """
+    filterParams = dict(FILTER_PARAMS, **(filterOptions or {}))
+    planeParams = dict(PLANE_PARAMS, **(planeOptions or {}))
+
+    if tracker is not None:
+        cacheFolder = None
+
+    if cacheFolder:
+        params = dict(filterParams, dynamic_z_offset=dynamic_z_offset, seed=seed, plane=planeParams)
+        cacheKey = frameCacheKey(inputFile, params)
+        outputs = [filteredOutputFile]
+        if pcdExportFolder and inputFile.endswith(".ply"):
+            outputs.append(pcdExportPath(inputFile, pcdExportFolder))
+
+        cached = loadCachedFrame(cacheFolder, inputFile, cacheKey)
+        # Only trust the entry if the files a fresh run would have written are still there
+        if cached is not None and all(os.path.exists(f) for f in outputs if f):
+            cached['cached'] = True
+            cached['status'] = str(cached['status'])  # Strings come back as 0-d arrays
+            cached['rejection_reason'] = str(cached['rejection_reason'])
+            return cached
+
+    # PLY frames are decoded in memory and handed straight to the filter, the PCD copy is optional
+    frame = inputFile
+    if pcdExportFolder and inputFile.endswith(".ply"):
+        frame = loadPLYFrame(inputFile, pcdExportFolder)
+
+    # Process the point cloud and cluster it
+    frameStats = {}
+    cleanAndCluster = tracker.cleanAndCluster if tracker is not None else cleanAndClusterPointCloud
+    cleanedPcd, boundingBox, dimensions = cleanAndCluster(
+        frame, filteredOutputFile,
+        dynamic_z_offset=dynamic_z_offset,
+        stats=frameStats,
+        queryThreads=queryThreads,
+        **filterParams
+    )
+
+    result = {
+        'dimensions': np.zeros(3),
+        'average_z': 0.0,
+        'normal_vector': np.zeros(3),
+        'point_count': 0,
+        'min_bound': np.zeros(3),
+        'max_bound': np.zeros(3),
+        'skipped_clusters': frameStats.get('skipped_clusters', 0),
+        'status': 'ok' if cleanedPcd is not None else 'rejected' if 'rejected' in frameStats else 'failed',
+        'rejection_reason': frameStats.get('rejected', '') if cleanedPcd is None else '',
+    }
+
+    if cleanedPcd is not None:
+        points = np.asarray(cleanedPcd.points)
+        if dimensions is not None:
+            result['dimensions'] = dimensions
+        result['average_z'] = np.mean(points[:, 2])
+        result['point_count'] = len(points)
+        result['min_bound'] = points.min(axis=0)
+        result['max_bound'] = points.max(axis=0)
+
+        planeStart = time.perf_counter()
+        if seed is not None:
+            import open3d as o3d
+            o3d.utility.random.seed(seed)
+        if tracker is not None:
+            result['normal_vector'] = tracker.planeNormal(cleanedPcd)
+        else:
+            result['normal_vector'] = get_plane_normal(cleanedPcd, seed=seed, **planeParams)  # Imported function
+        frameStats['timings']['plane_fit'] = time.perf_counter() - planeStart
+
+    if cacheFolder:
+        saveCachedFrame(cacheFolder, inputFile, cacheKey, result)
+
+    result['cached'] = False
+    result['stats'] = frameStats
+    return result
+
+
+def processFolder(folderPath, outputFolder, timestamps, dynamic_z_offset=0.5, calculateBoundingBox=True,
+                  workers=1, fileExtension=".pcd", pcdExportFolder=None, cacheFolder=None, filterOptions=None,
+                  tracking=False, metrics=None, executor=None, showProgress=True, planeOptions=None,
+                  minQuality=0.3, chunkSize=None, resultsFile=None, resultsMetadata=None, verbose=True):
     """
     Processes a folder of PCD files and calculates bounding boxes and angular velocities.
+
+    Parameters:
+    - timestamps (array): Frame timestamps in seconds, one per file in sorted order. A count that
+      does not match the number of files is reported; frames without a timestamp are left out of
+      the RPM and get a NaN timestamp in the results file.
+    - fileExtension (str): Extension of the frames to process. Use ".ply" to ingest the raw camera
+      export directly, without converting it to PCD first.
+    - pcdExportFolder (str, optional): With PLY input, also write every decoded frame there as PCD.
+    - workers (int): Number of worker processes used for the per-frame filtering and plane fitting.
+      1 (default) processes frames serially in this process, None uses one worker per CPU core.
+      Results are always collected in frame order.
+    - cacheFolder (str, optional): Folder for the per-frame result cache. Frames whose content and
+      filter parameters are unchanged since the last (possibly interrupted) run are not reprocessed,
+      so changes to the RPM or scaling stages only cost the final aggregation.
+    - filterOptions (dict, optional): Overrides or additions to FILTER_PARAMS for every frame,
+      e.g. {'dbscanVoxelSize': 0.02} to cluster on a voxel-downsampled copy (see
+      point_cloud_filtering.compareDbscanFastPath for the accuracy check).
+    - tracking (bool or FrameTracker): Temporal-coherence mode. Each frame is cropped to the previous
+      frame's object bounds and its plane is re-fitted near the previous plane with far fewer RANSAC
+      iterations, falling back to the full pipeline when tracking is lost. Pass a FrameTracker to
+      tune it. Frames depend on each other in this mode, so it requires workers=1 and no cacheFolder.
+    - metrics (RunMetrics, optional): Collects the per-stage timings and point counts of every
+      processed frame, e.g. to combine several runs. A new one is used if None. The per-stage
+      percentile report is printed and returned as 'stage_report'.
+    - executor (ProcessPoolExecutor, optional): Existing pool to run the frames on instead of starting
+      one, e.g. shared by several folders processed at the same time. It is not shut down here;
+      workers is then only used to size the batches handed to it. Create it with
+      initializer=limitWorkerThreads, otherwise every worker runs OpenMP on all cores.
+    - showProgress (bool): Draw the loading bar. Turn it off when several folders run at once.
+    - verbose (bool): Print the run report (frame states, per-stage table, cache use, RPM). Turn it
+      off when several folders run at once, their lines would interleave; warnings are still printed.
+    - planeOptions (dict, optional): Overrides or additions to PLANE_PARAMS for every frame, e.g.
+      {'method': 'fast'} for the subsampled RANSAC with least-squares refinement. See
+      benchmarks/plane_estimators.py for the speed and accuracy of the options.
+    - minQuality (float): Frames with fewer cleaned points than this fraction of the recent frames'
+      median are marked low quality (see frame_quality.FrameQualityScorer). Frames that are low
+      quality, rejected early or failed are left out of the averages and the RPM, and marked in
+      the returned 'valid', 'quality' and 'status' arrays. 0 only leaves out frames without a result.
+    - chunkSize (int, optional): Chunked mode for long captures. Frames are processed and written
+      to resultsFile in windows of chunkSize frames. The averages, the Y outlier filter and the RPM
+      come from streaming aggregates (DimensionAccumulator, RPMEstimator), so memory stays the same
+      whatever the capture length. The per-frame arrays of the returned dict are then read-only
+      memory maps of resultsFile, 'status' is left out, and the file already holds the run summary.
+      Do not pass the returned dict to saveResults. The stage report then comes from a bounded
+      sample of the frames (see RunMetrics maxSamples).
+    - resultsFile (str): Results file written in chunked mode, see results_store.ResultsStore.
+    - resultsMetadata (dict, optional): Extra run metadata stored in resultsFile in chunked mode.
     """
+    tracker = None
+    if tracking:
+        if workers != 1 or executor is not None:
+            raise ValueError("Tracking mode processes frames sequentially, use workers=1.")
+        if cacheFolder:
+            raise ValueError("Tracked frames depend on the frames before them and cannot be cached, "
+                             "use cacheFolder=None.")
+        tracker = tracking if isinstance(tracking, FrameTracker) else FrameTracker()
+    if chunkSize is not None and not resultsFile:
+        raise ValueError("Chunked mode writes the per-frame results to disk, pass a resultsFile.")
+
     if not os.path.exists(outputFolder):
         os.makedirs(outputFolder)
 
-    boundingBoxDimensions = []
-    averageZValues = []
-    normalVectors = []
-
-    files = [f for f in os.listdir(folderPath) if f.endswith(".pcd")]
+    files = sorted(f for f in os.listdir(folderPath) if f.endswith(fileExtension))  # Ensure files are processed in order
     total_files = len(files)
 
-    for i, fileName in enumerate(sorted(files)):  # Ensure files are processed in order
-        inputFile = os.path.join(folderPath, fileName)
-        filteredOutputFile = os.path.join(outputFolder, f"filtered_{fileName}")
-
-        # Process the point cloud and cluster it
-        cleanedPcd, boundingBox, dimensions = cleanAndClusterPointCloud(
-            inputFile, filteredOutputFile,
-            useStatisticalFilter=True,
-            useRadiusFilter=True,
-            dynamic_z_offset=dynamic_z_offset,
-            eps=0.2,
-            minPoints=1000,
-            minClusterSize=500,
-            finalRadiusFilter=True
-        )
-
-        if cleanedPcd is not None and dimensions is not None:
-            boundingBoxDimensions.append(dimensions)
-        else:
-            boundingBoxDimensions.append(np.zeros(3))
-
-        if cleanedPcd is not None:
-            points = np.asarray(cleanedPcd.points)
-            average_z = np.mean(points[:, 2])
-            averageZValues.append(average_z)
-        else:
-            averageZValues.append(0.0)
+    # Per-frame values go into preallocated arrays, the run's averages into running statistics.
+    # In chunked mode the arrays hold one window and are flushed to the results file when full.
+    windowSize = min(chunkSize, total_files) if chunkSize is not None else total_files
+    boundingBoxDimensions = np.zeros((windowSize, 3))
+    averageZValues = np.zeros(windowSize)
+    normalVectors = np.zeros((windowSize, 3))
+    frameStatus = np.empty(windowSize, dtype=object)
+    frameQuality = np.zeros(windowSize)
+    angularVelocities = np.full(windowSize, np.nan)
+    dimensionStats = DimensionAccumulator()
+    scorer = FrameQualityScorer(minQuality)
+    rpmEstimator = RPMEstimator()
+    timestamps = np.asarray(timestamps, dtype=float)
+    if len(timestamps) != total_files:
+        print(f"Warning: {len(timestamps)} timestamps for {total_files} frames in {folderPath}. "
+              + ("Extra timestamps are ignored." if len(timestamps) > total_files else
+                 f"The last {total_files - len(timestamps)} frames have no timestamp and are left out of the RPM."))
+        timestamps = timestamps[:total_files]
 
-        if cleanedPcd is not None:
-            normal_vector = get_plane_normal(cleanedPcd)  # Imported function
-            normalVectors.append(normal_vector)
-        else:
-            normalVectors.append([0.0, 0.0, 0.0])
+    store = None
+    if chunkSize is not None:
+        store = ResultsStore.create(resultsFile, resultsMetadata)
 
-        # Update the loading bar
-        update_loading_bar(i + 1, total_files)
+    def flush(start, count):
+        # Adds a full window to the running statistics and, in chunked mode, to the results file
+        valid = frameStatus[:count] == 'ok'
+        dimensionStats.addMany(boundingBoxDimensions[:count][valid], averageZValues[:count][valid])
+        if store is not None:
+            frameTimestamps = np.full(count, np.nan)
+            known = timestamps[start:start + count]
+            frameTimestamps[:len(known)] = known
+            store.append(timestamp=frameTimestamps, normal=normalVectors[:count],
+                         extent=boundingBoxDimensions[:count], mean_z=averageZValues[:count],
+                         angular_velocity=angularVelocities[:count], valid=valid, quality=frameQuality[:count])
 
-    print()  # Move to the next line after the loading bar
+    # Paths are made as the frames are handed out, filtered frames are always written as PCD so the
+    # animation can pick them up
+    inputFiles = (os.path.join(folderPath, fileName) for fileName in files)
+    filteredOutputFiles = (os.path.join(outputFolder, f"filtered_{os.path.splitext(fileName)[0]}.pcd")
+                           for fileName in files)
+    seeds = range(total_files)
 
-    overall_average_z = np.mean(averageZValues) if averageZValues else 0.0
+    # Frames on a process pool already use every core, so each one queries on a single thread
+    onPool = executor is not None or workers != 1
+    frameFunction = partial(processFrame, dynamic_z_offset=dynamic_z_offset,
+                            pcdExportFolder=pcdExportFolder, cacheFolder=cacheFolder,
+                            filterOptions=filterOptions, tracker=tracker, planeOptions=planeOptions,
+                            queryThreads=1 if onPool else -1)
 
-    if boundingBoxDimensions:
-        boundingBoxDimensions = np.array(boundingBoxDimensions)
-        average_bounding_box_dimensions = np.mean(boundingBoxDimensions, axis=0)
+    ownExecutor = False
+    if not onPool:
+        frameResults = map(frameFunction, inputFiles, filteredOutputFiles, seeds)
     else:
-        boundingBoxDimensions = np.zeros((0, 3))
-        average_bounding_box_dimensions = np.zeros(3)
+        if executor is None:
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=limitWorkerThreads)
+            ownExecutor = True
+        # Hand out frames in small batches to keep IPC overhead low while still balancing the load
+        numWorkers = workers or os.cpu_count() or 1
+        chunksize = max(1, min(16, windowSize // (numWorkers * 4)))
+        frameResults = mapInWindows(executor, frameFunction, max(1, windowSize), inputFiles, filteredOutputFiles, seeds,
+                                    chunksize=chunksize)
+
+    if metrics is None:
+        metrics = RunMetrics(maxSamples=10000 if store is not None else None)
+    cachedFrames = 0
+    skippedClusters = 0
+    try:
+        for i, frameResult in enumerate(frameResults):
+            j = i % windowSize
+            boundingBoxDimensions[j] = frameResult['dimensions']
+            averageZValues[j] = frameResult['average_z']
+            normalVectors[j] = frameResult['normal_vector']
+            frameStatus[j], frameQuality[j] = scorer.score(frameResult)
+            angularVelocities[j] = np.nan
+            if store is not None and frameStatus[j] == 'ok' and i < len(timestamps):
+                velocity = rpmEstimator.update(normalVectors[j], timestamps[i])
+                if velocity is not None:
+                    angularVelocities[j] = velocity
+            if j == windowSize - 1 or i == total_files - 1:
+                flush(i - j, j + 1)
+            cachedFrames += bool(frameResult['cached'])
+            skippedClusters += int(frameResult['skipped_clusters'])
+            if 'stats' in frameResult:
+                metrics.add(frameResult['stats'])
+
+            # Update the loading bar
+            if showProgress:
+                update_loading_bar(i + 1, total_files)
+    finally:
+        if ownExecutor:
+            executor.shutdown()
 
-    y_dimensions = boundingBoxDimensions[:, 1]
-    _, filtered_y_average = remove_outliers_y(y_dimensions)
+    if showProgress:
+        print()  # Move to the next line after the loading bar
+    if verbose:
+        if tracker is not None:
+            print(f"Tracking: {tracker.trackedFrames} frames cropped to the tracked ROI, "
+                  f"{tracker.fallbackFrames} ROI and {tracker.planeFallbacks} plane fallbacks to the full pipeline.")
+        if skippedClusters:
+            print(f"Skipped {skippedClusters} small/insignificant clusters across {total_files} frames.")
+        print(scorer.summary())
+        metrics.printReport()
+        if cacheFolder:
+            print(f"Reused {cachedFrames} of {total_files} frames from the cache in {cacheFolder}")
 
-    if boundingBoxDimensions.size > 0:
-        average_bounding_box_dimensions[1] = filtered_y_average
+    # With every frame in memory the Y outlier filter is exact, the histogram is for chunked mode
+    exactYAverage = None
+    if store is None and np.any(frameStatus == 'ok'):
+        _, exactYAverage = remove_outliers_y(boundingBoxDimensions[frameStatus == 'ok', 1])
+    summary = dimensionStats.summary(scaling_factor, filteredYAverage=exactYAverage)
+    overall_average_z = summary['overall_average_z']
+    filtered_y_average = summary['filtered_y_average']
+    scaled_dimensions_cm = summary['scaled_dimensions_cm']
 
-    scaling_factor = -0.0287 * overall_average_z + 0.8376
+    if store is not None:
+        # The scale is only known at the end, fill in the scaled extents one window at a time
+        for start in range(0, total_files, max(1, windowSize)):
+            extents = store.read('extent', start, start + windowSize)
+            store.write(start, scaled_extent_cm=extents * summary['scale'] * 100)
+        rpm = rpmEstimator.rpm
+        if verbose:
+            print(f"\nCalculated RPM: {rpm}")
 
-    scaled_dimensions_cm = average_bounding_box_dimensions * scaling_factor * 100
-    scaled_bounding_box_dimensions = boundingBoxDimensions * scaling_factor * 100
+        frames = store.read()
+        results = {
+            'bounding_boxes': frames['extent'],
+            'scaled_bounding_boxes': frames['scaled_extent_cm'],
+            'average_z_values': frames['mean_z'],
+            'overall_average_z': overall_average_z,
+            'scaled_dimensions_cm': scaled_dimensions_cm.tolist(),
+            'filtered_y_average': filtered_y_average,
+            'normal_vectors': frames['normal'],
+            'rpm': rpm,
+            'angular_velocities': frames['angular_velocity'][1:],
+            'valid': frames['valid'],
+            'quality': frames['quality'],
+            'frame_counts': dict(scorer.statusCounts),
+            'results_file': resultsFile,
+            'stage_report': metrics.report()
+        }
+        store.updateMetadata(**runSummary(results))
+        return results
 
-    rpm, angular_velocities = calculate_rpm(normalVectors, timestamps)  # Imported function
-    print(f"\nCalculated RPM: {rpm}")
+    scaled_bounding_box_dimensions = boundingBoxDimensions * summary['scale'] * 100
+    validFrames = frameStatus == 'ok'
+    rpm, angular_velocities = calculate_rpm(normalVectors, timestamps, valid=validFrames)  # Imported function
+    if verbose:
+        print(f"\nCalculated RPM: {rpm}")
 
     return {
-        'scaled_bounding_boxes': np.array(scaled_bounding_box_dimensions),
-        'average_z_values': np.array(averageZValues),
+        'bounding_boxes': boundingBoxDimensions,
+        'scaled_bounding_boxes': scaled_bounding_box_dimensions,
+        'average_z_values': averageZValues,
         'overall_average_z': overall_average_z,
         'scaled_dimensions_cm': scaled_dimensions_cm.tolist(),
         'filtered_y_average': filtered_y_average,
-        'normal_vectors': np.array(normalVectors),
+        'normal_vectors': normalVectors,
         'rpm': rpm,
-        'angular_velocities': angular_velocities  # Include angular velocities in the result
+        'angular_velocities': angular_velocities,  # Include angular velocities in the result
+        'valid': validFrames,
+        'quality': frameQuality,
+        'status': frameStatus.astype(str),
+        'frame_counts': dict(scorer.statusCounts),
+        'stage_report': metrics.report()
     }
\ No newline at end of file
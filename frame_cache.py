@@ -0,0 +1,74 @@
+import hashlib
+import json
+import os
+import numpy as np
+
+# Bump whenever the fields stored per frame change, so older entries are treated as stale
+FRAME_CACHE_VERSION = 3
+
+
+def fileDigest(file_path, chunk_size=1 << 20):
+    """
+    Returns the SHA-1 hex digest of a file's content, read in chunks to keep memory flat.
+    """
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def frameCacheKey(input_file, params):
+    """
+    Builds the cache key for a frame from its file content and the processing parameters.
+
+    Parameters:
+    - input_file (str): Path to the frame file.
+    - params (dict): Parameters that affect the per-frame result (JSON serialisable).
+
+    Returns:
+    - str: Hex digest that changes whenever the file or any parameter changes.
+    """
+    key = hashlib.sha1(fileDigest(input_file).encode())
+    key.update(json.dumps(dict(params, cache_version=FRAME_CACHE_VERSION), sort_keys=True).encode())
+    return key.hexdigest()
+
+
+def _cachePath(cache_folder, input_file):
+    return os.path.join(cache_folder, os.path.basename(input_file) + ".npz")
+
+
+def loadCachedFrame(cache_folder, input_file, key):
+    """
+    Loads the cached result for a frame.
+
+    Returns:
+    - dict or None: The cached per-frame result, or None if it is missing, unreadable or stale.
+    """
+    cache_file = _cachePath(cache_folder, input_file)
+    if not os.path.exists(cache_file):
+        return None
+
+    try:
+        with np.load(cache_file) as data:
+            if str(data['key']) != key:
+                return None
+            return {name: data[name] for name in data.files if name != 'key'}
+    except (OSError, ValueError, KeyError):
+        # A run that crashed mid-write leaves nothing behind (see saveCachedFrame), but be safe
+        return None
+
+
+def saveCachedFrame(cache_folder, input_file, key, result):
+    """
+    Stores a per-frame result under the given key.
+    The entry is written to a temporary file and renamed, so an interrupted run never leaves a
+    half-written entry that a later run would trust.
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    cache_file = _cachePath(cache_folder, input_file)
+    temp_file = cache_file + f".{os.getpid()}.tmp"
+
+    with open(temp_file, 'wb') as file:
+        np.savez(file, key=np.array(key), **result)
+    os.replace(temp_file, cache_file)
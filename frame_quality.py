@@ -0,0 +1,53 @@
+from collections import deque
+import numpy as np
+
+# Frame states, as reported by processFrame ('ok', 'rejected', 'failed') and FrameQualityScorer
+FRAME_STATUSES = ('ok', 'low_quality', 'rejected', 'failed')
+
+
+class FrameQualityScorer:
+    """
+    Scores frames against the recent frames of the same run, so the statistics of a run can leave
+    out frames that are clearly worse than their neighbors instead of averaging them in.
+
+    A frame's quality is its cleaned point count relative to the median point count of the last
+    `window` processed frames, capped at 1. Point counts drop sharply when the object is partly
+    occluded, motion-blurred or clipped by the crop, which is also when its bounding box and plane
+    fit become unreliable. Rejected and failed frames have a quality of 0.
+
+    Parameters:
+    - minQuality (float): Frames below this quality are marked 'low_quality'.
+    - window (int): Number of recent frames the point counts are compared against.
+    """
+
+    def __init__(self, minQuality=0.3, window=50):
+        self.minQuality = minQuality
+        self.recentCounts = deque(maxlen=window)
+        self.statusCounts = dict.fromkeys(FRAME_STATUSES, 0)
+
+    def score(self, frameResult):
+        """
+        Scores one processFrame result. Frames must be passed in order.
+
+        Returns:
+        - status (str): 'ok', 'low_quality', 'rejected' or 'failed'.
+        - quality (float): Between 0 and 1.
+        """
+        status = str(frameResult.get('status', 'ok' if frameResult['point_count'] > 0 else 'failed'))
+        quality = 0.0
+        if status == 'ok':
+            pointCount = int(frameResult['point_count'])
+            quality = min(1.0, pointCount / np.median(self.recentCounts)) if self.recentCounts else 1.0
+            self.recentCounts.append(pointCount)
+            if quality < self.minQuality:
+                status = 'low_quality'
+        self.statusCounts[status] += 1
+        return status, quality
+
+    def summary(self):
+        """
+        One line with the number of frames in each state.
+        """
+        counts = self.statusCounts
+        return (f"Frames: {counts['ok']} ok, {counts['low_quality']} low quality, "
+                f"{counts['rejected']} rejected early, {counts['failed']} failed.")
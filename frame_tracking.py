@@ -0,0 +1,96 @@
+import numpy as np
+from point_cloud_filtering import cleanAndClusterPointCloud
+from rotation_calculations import fit_plane, refine_plane, plane_normal
+
+
+class FrameTracker:
+    """
+    Carries the object's position and plane from one frame to the next, for sequential processing.
+
+    While tracking, each frame is only cleaned and clustered inside the previous frame's cluster
+    bounds plus a margin, and the plane is re-fitted near the previous plane with far fewer RANSAC
+    iterations. Whenever that fails (nothing found in the ROI, the object reaches the ROI edge, or
+    the plane loses too many inliers) the frame falls back to the full pipeline and tracking restarts.
+
+    Parameters:
+    - roiMargin (float): Margin in meters added around the previous cluster bounds.
+    - planeSearchBand (float): Distance in meters from the previous plane searched for the new plane.
+    - trackedIterations (int): RANSAC iterations for the tracked plane fit.
+    - fullIterations (int): RANSAC iterations for the full plane fit.
+    - minInlierRatio (float): Tracking is lost if the tracked plane keeps less than this fraction of
+      the previous frame's inlier ratio.
+    """
+
+    def __init__(self, roiMargin=0.1, planeSearchBand=0.05, trackedIterations=100, fullIterations=1000,
+                 minInlierRatio=0.5):
+        self.roiMargin = roiMargin
+        self.planeSearchBand = planeSearchBand
+        self.trackedIterations = trackedIterations
+        self.fullIterations = fullIterations
+        self.minInlierRatio = minInlierRatio
+
+        # Frames cleaned inside the ROI, and frames that lost the ROI or the plane and ran in full
+        self.trackedFrames = 0
+        self.fallbackFrames = 0
+        self.planeFallbacks = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Drops the tracked state, the next frame runs the full pipeline.
+        """
+        self.roi = None
+        self.planeModel = None
+        self.inlierRatio = None
+
+    def _insideRoi(self, pcd):
+        # The object must stay clear of the ROI edge, otherwise part of it may have been cropped away
+        innerMargin = self.roiMargin / 2
+        return (np.all(pcd.get_min_bound() >= self.roi[0] + innerMargin)
+                and np.all(pcd.get_max_bound() <= self.roi[1] - innerMargin))
+
+    def cleanAndCluster(self, frame, outputFile=None, **kwargs):
+        """
+        cleanAndClusterPointCloud restricted to the tracked ROI, with a full-frame fallback.
+        Takes and returns the same values as cleanAndClusterPointCloud. After a fallback, the stats
+        are the full-frame run's, with the time spent on the ROI attempt timed as 'roi_attempt'.
+        """
+        stats = kwargs.get('stats')
+        roiTime = None
+        if self.roi is not None:
+            cleanedPcd, bbox, bboxSize = cleanAndClusterPointCloud(frame, outputFile, roi=self.roi, **kwargs)
+            if cleanedPcd is not None and self._insideRoi(cleanedPcd):
+                self.trackedFrames += 1
+                self._updateRoi(cleanedPcd)
+                return cleanedPcd, bbox, bboxSize
+            self.fallbackFrames += 1
+            self.reset()
+            if stats is not None:
+                stats.pop('rejected', None)  # Only the full-frame attempt decides the frame's status
+                roiTime = sum(stats.get('timings', {}).values())
+
+        cleanedPcd, bbox, bboxSize = cleanAndClusterPointCloud(frame, outputFile, **kwargs)
+        if roiTime is not None:
+            stats['timings']['roi_attempt'] = roiTime
+        if cleanedPcd is not None:
+            self._updateRoi(cleanedPcd)
+        return cleanedPcd, bbox, bboxSize
+
+    def _updateRoi(self, pcd):
+        self.roi = (pcd.get_min_bound() - self.roiMargin, pcd.get_max_bound() + self.roiMargin)
+
+    def planeNormal(self, pcd):
+        """
+        Returns the unit normal of the largest plane, re-fitted near the previous plane when tracking.
+        """
+        if self.planeModel is not None:
+            plane_model, inlier_ratio = refine_plane(pcd, self.planeModel,
+                                                     search_band=self.planeSearchBand,
+                                                     num_iterations=self.trackedIterations)
+            if plane_model is not None and inlier_ratio >= self.minInlierRatio * self.inlierRatio:
+                self.planeModel, self.inlierRatio = plane_model, inlier_ratio
+                return plane_normal(plane_model)
+            self.planeFallbacks += 1
+
+        self.planeModel, self.inlierRatio = fit_plane(pcd, num_iterations=self.fullIterations)
+        return plane_normal(self.planeModel)
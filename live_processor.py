@@ -0,0 +1,197 @@
+import argparse
+import os
+import time
+import numpy as np
+from dimension_stats import DimensionAccumulator
+from folder_processor import processFrame, scaling_factor
+from frame_quality import FrameQualityScorer
+from frame_tracking import FrameTracker
+from metadata_parser import extract_number, parseMetadataFile
+from rotation_calculations import RPMEstimator
+
+
+def watchFrames(plyFolder, metadataFolder=None, pollInterval=0.5, idleTimeout=None):
+    """
+    Yields the frames a running capture writes, as soon as they are complete.
+
+    A file counts as complete once its size stayed the same over one poll interval. The n-th PLY
+    file (by name) is paired with the n-th metadata file (by frame number). Only the last names
+    seen are kept, so memory does not grow with the length of the capture.
+
+    Parameters:
+    - plyFolder (str): Folder the camera writes the PLY frames to.
+    - metadataFolder (str, optional): Folder with the metadata txt files. Without it the PLY file's
+      modification time is used as the frame timestamp.
+    - pollInterval (float): Seconds between folder scans.
+    - idleTimeout (float, optional): Stop after this many seconds without a new frame. None waits forever.
+
+    Yields:
+    - (str, float): Path of the PLY frame and its timestamp in seconds.
+    """
+    lastPly = None
+    lastMetadata = None
+    pendingSizes = {}
+    lastFrameTime = time.monotonic()
+
+    def newFiles(folder, suffix, last, sortKey):
+        names = [entry.name for entry in os.scandir(folder)
+                 if entry.name.endswith(suffix) and not entry.name.startswith("._")]
+        return sorted((name for name in names if last is None or sortKey(name) > sortKey(last)), key=sortKey)
+
+    while True:
+        plyFiles = newFiles(plyFolder, ".ply", lastPly, lambda name: name)
+        metadataFiles = newFiles(metadataFolder, ".txt", lastMetadata, extract_number) if metadataFolder else []
+
+        yielded = False
+        ready = True
+        for i, plyName in enumerate(plyFiles):
+            plyPath = os.path.join(plyFolder, plyName)
+            size = os.path.getsize(plyPath)
+            previousSize = pendingSizes.get(plyPath)
+            pendingSizes[plyPath] = size
+            # Frames are yielded in order, so stop at the first one that may still be written,
+            # but keep recording the sizes of the rest for the next poll
+            ready = ready and previousSize == size
+            if metadataFolder and ready:
+                if i >= len(metadataFiles):
+                    ready = False  # Metadata for this frame is not there yet
+                else:
+                    timestamp, _ = parseMetadataFile(os.path.join(metadataFolder, metadataFiles[i]))
+                    ready = not np.isnan(timestamp)  # NaN while the metadata file is still being written
+            if not ready:
+                continue
+
+            if metadataFolder:
+                lastMetadata = metadataFiles[i]
+            else:
+                timestamp = os.path.getmtime(plyPath)
+
+            del pendingSizes[plyPath]
+            lastPly = plyName
+            yielded = True
+            yield plyPath, timestamp
+
+        if yielded:
+            lastFrameTime = time.monotonic()
+        elif idleTimeout is not None and time.monotonic() - lastFrameTime > idleTimeout:
+            return
+        else:
+            time.sleep(pollInterval)
+
+
+class LiveProcessor:
+    """
+    Processes frames one at a time and keeps running estimates of the RPM and the scaled dimensions.
+
+    Memory stays bounded: dimensions, mean Z and the Y outlier filter come from a
+    DimensionAccumulator, the RPM from an incremental RPMEstimator, as in processFolder's chunked mode.
+
+    Parameters:
+    - outputFolder (str, optional): Folder for the filtered frames, nothing is written if None.
+    - dynamic_z_offset (float): Offset for the dynamic Z filter, as in processFolder.
+    - filterOptions (dict, optional): Overrides for folder_processor.FILTER_PARAMS.
+    - tracking (bool): Seed each frame from the previous one (see frame_tracking.FrameTracker).
+    - minQuality (float): Frames scored below this (see frame_quality.FrameQualityScorer) and frames
+      rejected early are left out of the estimates.
+    """
+
+    def __init__(self, outputFolder=None, dynamic_z_offset=0.5, filterOptions=None, tracking=True, minQuality=0.3):
+        self.outputFolder = outputFolder
+        self.dynamic_z_offset = dynamic_z_offset
+        self.filterOptions = filterOptions
+        self.tracker = FrameTracker() if tracking else None
+        if outputFolder:
+            os.makedirs(outputFolder, exist_ok=True)
+
+        self.frameCount = 0
+        self.latencySum = 0.0
+        self.dimensionStats = DimensionAccumulator()
+        self.rpmEstimator = RPMEstimator()
+        self.scorer = FrameQualityScorer(minQuality)
+
+    def update(self, frame, timestamp, name=None):
+        """
+        Runs one frame through cleanAndClusterPointCloud/get_plane_normal and updates the estimates.
+
+        Parameters:
+        - frame (str or o3d.geometry.PointCloud): Path of the frame file or the decoded frame.
+        - timestamp (float): Frame timestamp in seconds.
+        - name (str, optional): Name for the filtered output file, defaults to the frame's filename.
+
+        Returns:
+        - dict with the current estimates, this frame's status and quality and its latency in seconds.
+        """
+        start = time.perf_counter()
+
+        filteredOutputFile = None
+        if self.outputFolder:
+            if name is None:
+                name = os.path.basename(frame) if isinstance(frame, str) else f"frame_{self.frameCount:06d}"
+            filteredOutputFile = os.path.join(self.outputFolder, f"filtered_{os.path.splitext(name)[0]}.pcd")
+
+        result = processFrame(frame, filteredOutputFile, seed=self.frameCount,
+                              dynamic_z_offset=self.dynamic_z_offset,
+                              filterOptions=self.filterOptions, tracker=self.tracker)
+        self.frameCount += 1
+
+        status, quality = self.scorer.score(result)
+        if status == 'ok':
+            self.dimensionStats.add(result['dimensions'], result['average_z'])
+            self.rpmEstimator.update(result['normal_vector'], timestamp)
+
+        latency = time.perf_counter() - start
+        self.latencySum += latency
+        return dict(self.estimates(), status=status, quality=quality, latency=latency)
+
+    def estimates(self):
+        """
+        Returns the running RPM, scaled dimensions (cm) and mean Z over the frames seen so far.
+        """
+        if self.dimensionStats.frames == 0:
+            return {'frames': self.frameCount, 'rpm': 0.0, 'scaled_dimensions_cm': [0.0, 0.0, 0.0],
+                    'overall_average_z': 0.0, 'mean_latency': 0.0}
+
+        summary = self.dimensionStats.summary(scaling_factor)
+        return {
+            'frames': self.frameCount,
+            'rpm': self.rpmEstimator.rpm,
+            'scaled_dimensions_cm': summary['scaled_dimensions_cm'].tolist(),
+            'overall_average_z': summary['overall_average_z'],
+            'mean_latency': self.latencySum / self.frameCount,
+        }
+
+    def run(self, frames):
+        """
+        Processes frames from any iterable of (frame, timestamp), e.g. watchFrames or a camera
+        generator, and yields the updated estimates after every frame.
+        """
+        for frame, timestamp in frames:
+            yield self.update(frame, timestamp)
+
+
+def streamFolder(plyFolder, metadataFolder=None, outputFolder=None, idleTimeout=None, **kwargs):
+    """
+    Processes a capture while the camera is still writing it and prints the running estimates.
+    Returns the final estimates once no new frame arrived for idleTimeout seconds.
+    """
+    processor = LiveProcessor(outputFolder=outputFolder, **kwargs)
+    estimates = processor.estimates()
+    for estimates in processor.run(watchFrames(plyFolder, metadataFolder, idleTimeout=idleTimeout)):
+        width, height, depth = estimates['scaled_dimensions_cm']
+        print(f"\rFrame {estimates['frames']}: RPM {estimates['rpm']:.2f}, "
+              f"{width:.1f} x {height:.1f} x {depth:.1f} cm, "
+              f"latency {estimates['latency'] * 1000:.0f} ms", end="", flush=True)
+    print()
+    return estimates
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Process an L515 capture live, while it is being recorded.")
+    parser.add_argument("ply_folder", help="Folder the camera writes the PLY frames to")
+    parser.add_argument("--metadata-folder", help="Folder with the metadata txt files")
+    parser.add_argument("--output-folder", help="Folder for the filtered frames")
+    parser.add_argument("--idle-timeout", type=float, default=30.0,
+                        help="Stop after this many seconds without a new frame (default: 30)")
+    args = parser.parse_args()
+
+    streamFolder(args.ply_folder, args.metadata_folder, args.output_folder, idleTimeout=args.idle_timeout)
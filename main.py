@@ -1,72 +1,74 @@
+import argparse
 import os
-import numpy as np
-import pandas as pd
-from ply_to_pcd_converter import convertPLYtoPCD  # Import the function from the external file
 from folder_processor import processFolder  # Ensure this imports your processFolder function
 from metadata_parser import timeStamps  # Import timeStamps function
-from animation import display_pcd_animation  # Import the animation function
+from results_store import saveResults
 
 
-def main():
+def main(headless=False, renderFolder=None):
     # Define the test number as a variable
     test_number = ("2")
 
     # Define input and output folders using the variable
     plyInputFolder = f"/Data/Test{test_number}/ply_files"
     metadataFolder = f"/Data/Test{test_number}/txt_files"
-    pcdIntermediateFolder = f"/LASER2/Data/Test{test_number}"  # Folder for converted PCD files
+    pcdIntermediateFolder = f"/LASER2/Data/Test{test_number}"  # Folder for the optional PCD copies
     outputPCDFolder = f"/LASER2/OutputPCD/Test{test_number}"
-    outputCSVFolder = f"/FinalDataOutput/Test{test_number}"
+    outputResultsFolder = f"/FinalDataOutput/Test{test_number}"
+    frameCacheFolder = f"/LASER2/FrameCache/Test{test_number}"  # Per-frame results reused by later runs
+    exportPCD = False  # Set to True to also keep a PCD copy of every raw PLY frame
+    chunkSize = None  # Set e.g. to 1000 for multi-hour captures, so memory stays flat (see processFolder)
 
-    # Ensure the outputCSVFolder exists
-    os.makedirs(outputCSVFolder, exist_ok=True)
+    # Ensure the outputResultsFolder exists
+    os.makedirs(outputResultsFolder, exist_ok=True)
 
-    # Step 1: Convert PLY files to PCD
-    print("Converting PLY files to PCD...")
-    converted_files = convertPLYtoPCD(plyInputFolder, pcdIntermediateFolder)
-    print(f"Converted PLY files saved to: {pcdIntermediateFolder}")
-
-    # Step 2: Extract timestamps
+    # Step 1: Extract timestamps
     print("Extracting timestamps from metadata...")
-    timestamps = timeStamps(metadataFolder)
-
-    # Step 3: Process PCD files to filter, create projections, and calculate bounding boxes/projection areas
-    print("\nProcessing PCD files to filter and calculate bounding boxes and projection areas...")
+    timestamps = timeStamps(metadataFolder, indexFile=os.path.join(outputResultsFolder, "metadata_index.npz"))
+
+    resultsFile = os.path.join(outputResultsFolder, "results.laser")
+    resultsMetadata = {
+        'test_number': test_number,
+        'ply_folder': plyInputFolder,
+        'metadata_folder': metadataFolder,
+        'dynamic_z_offset': 0.5,
+    }
+
+    # Step 2: Stream the PLY frames straight into the filter, create projections, and calculate bounding boxes/projection areas
+    print("\nProcessing PLY files to filter and calculate bounding boxes and projection areas...")
     results = processFolder(
-        folderPath=pcdIntermediateFolder,
+        folderPath=plyInputFolder,
         outputFolder=outputPCDFolder,
         timestamps=timestamps,  # Pass the extracted timestamps here
         dynamic_z_offset=0.5,  # Adjust this value as needed
-        calculateBoundingBox=True
+        calculateBoundingBox=True,
+        workers=None,  # Use one worker process per CPU core
+        fileExtension=".ply",
+        pcdExportFolder=pcdIntermediateFolder if exportPCD else None,
+        cacheFolder=frameCacheFolder,
+        chunkSize=chunkSize,
+        resultsFile=resultsFile if chunkSize else None,
+        resultsMetadata=resultsMetadata
     )
-
-    # Step 4: Save results
-    dimensions_file = os.path.join(outputCSVFolder, "bounding_box_dimensions.csv")
-    angular_velocities_file = os.path.join(outputCSVFolder, "angular_velocities.csv")
-    timestamps_file = os.path.join(outputCSVFolder, "timestamps.csv")
-    scaled_dimensions_file = os.path.join(outputCSVFolder, "scaled_dimensions_cm.csv")
-
-    # Save bounding box dimensions
-    bounding_boxes = results['scaled_bounding_boxes']  # This is an (N, 3) array
-    bounding_boxes_df = pd.DataFrame(bounding_boxes, columns=["width", "height", "depth"])
-    bounding_boxes_df.to_csv(dimensions_file, index=False)
-
-    # Save timestamps
-    timestamps_df = pd.DataFrame({"timestamp": timestamps})
-    timestamps_df.to_csv(timestamps_file, index=False)
-
-    # Save scaled dimensions
-    scaled_dimensions = np.array(results['scaled_dimensions_cm']).reshape(1, 3)  # Reshape into (1, 3)
-    scaled_dimensions_df = pd.DataFrame(scaled_dimensions, columns=["width_cm", "height_cm", "depth_cm"])
-    scaled_dimensions_df.to_csv(scaled_dimensions_file, index=False)
-
-    # Save angular velocities
-    angular_velocities = results['angular_velocities']
-    angular_velocities_df = pd.DataFrame({"angular_velocity": angular_velocities})
-    angular_velocities_df.to_csv(angular_velocities_file, index=False)
-
-
-    # Step 5: Display the animation with additional information
+    if exportPCD:
+        print(f"PCD copies of the PLY files saved to: {pcdIntermediateFolder}")
+
+    # Step 3: Save all per-frame results and the run summary to a single results file (chunked
+    # runs have written it as they went)
+    if not chunkSize:
+        saveResults(resultsFile, results, timestamps, metadata=resultsMetadata)
+    print(f"Results saved to: {resultsFile}")
+
+    # Step 4: Display the animation with additional information, unless running headless. Headless
+    # runs can render the frames to PNGs instead, for review on another machine.
+    if renderFolder:
+        from animation import render_pcd_frames
+        render_pcd_frames(outputPCDFolder, renderFolder, workers=None)
+    if headless:
+        print("\nProcessing complete.")
+        return
+
+    from animation import display_pcd_animation  # Only loads the visualizer when it is used
     print("\nStarting point cloud animation...")
     average_rpm = results['rpm']
     scaled_dimensions = results['scaled_dimensions_cm']
@@ -77,4 +79,10 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Process one L515 test and show the filtered frames.")
+    parser.add_argument("--headless", action="store_true",
+                        help="Skip the animation and never load the visualizer, e.g. on a server")
+    parser.add_argument("--render-frames", metavar="FOLDER",
+                        help="Render the filtered frames offscreen to PNGs in this folder (no display needed)")
+    args = parser.parse_args()
+    main(headless=args.headless, renderFolder=args.render_frames)
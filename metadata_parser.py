@@ -5,47 +5,108 @@ import os
 import numpy as np
 import re
 
-def timeStamps(folder_path):
-    def extract_number(filename):
-        # Adjust the regex to capture the numeric part after '_metadata_'
-        match = re.search(r'_metadata_(\d+\.\d+)', filename)
-        return float(match.group(1)) if match else float('inf')  # Use a high value for files without numbers
-    # Enter folder path that contains Metadata.
-    # Get all files in the folder
-    numFrames = 4000  # Number of frames user wants to check
-    x = 0  # Counter Varible
-    # Intializing needed arrays to store data
-    timeStamps, counter = np.zeros(numFrames), np.zeros(numFrames)
-    # Loop through all items in the folder
-    sortedFiles = sorted(os.listdir(folder_path), key=extract_number)
-    for filename in sortedFiles:
-        if filename.startswith("._"):
-            continue
-        if x >= numFrames:
-            break
-        file_path = os.path.join(folder_path, filename)
-        with open(file_path, 'r') as file:
-            content = file.read()
-        lines = content.splitlines()  # Split the content into lines
-        for line in lines:
-            # Extracts Given timestamp from metaData
-            if 'Frame Timestamp' in line:
-                timeVal = ""
-                for char in line:
-                    if char.isdigit():
-                        timeVal += char
-                time_Val = float(timeVal) / 10 ** 6  # Converting TimeStamp from micro seconds to seconds
-                timeStamps[x] = time_Val
-            # Extracts Frame Number
-            if 'Frame Counter' in line:
-                frameNum = ""
-                for char in line:
-                    if char.isdigit():
-                        frameNum += char
-                frame_Num = float(frameNum)
-                counter[x] = frame_Num
-                if (x != 0) and not (counter[x] >= counter[x - 1]):
-                    # Checks if frames are in order
-                    raise SystemExit("ERROR: FRAMES OUT OF ORDER")
-        x += 1  # Iterate through frames
+# Whole lines holding the values, the digits on them are joined into the number
+TIMESTAMP_LINE = re.compile(r'^.*Frame Timestamp.*$', re.MULTILINE)
+COUNTER_LINE = re.compile(r'^.*Frame Counter.*$', re.MULTILINE)
+NON_DIGITS = re.compile(r'\D')
+
+
+def extract_number(filename):
+    # Adjust the regex to capture the numeric part after '_metadata_'
+    match = re.search(r'_metadata_(\d+\.\d+)', filename)
+    return float(match.group(1)) if match else float('inf')  # Use a high value for files without numbers
+
+
+def listMetadataFiles(folder_path):
+    """
+    Lists the metadata files of a folder in frame order, with their size and modification time.
+
+    Returns:
+    - list of (str, int, int): Filename, size in bytes and mtime in nanoseconds, sorted by frame.
+    """
+    entries = [(entry.name, entry.stat()) for entry in os.scandir(folder_path)
+               if entry.is_file() and not entry.name.startswith("._")]
+    entries.sort(key=lambda entry: extract_number(entry[0]))
+    return [(name, stat.st_size, stat.st_mtime_ns) for name, stat in entries]
+
+
+def _lastNumber(pattern, content):
+    # Uses the last matching line, like the original line-by-line scan did
+    lines = pattern.findall(content)
+    if not lines:
+        return np.nan
+    digits = NON_DIGITS.sub("", lines[-1])
+    return float(digits) if digits else np.nan
+
+
+def parseMetadataFile(file_path):
+    """
+    Reads the frame timestamp and frame counter from a single metadata file.
+
+    Returns:
+    - (float, float): Timestamp in seconds and frame counter, NaN for a value the file does not contain.
+    """
+    with open(file_path, 'r') as file:
+        content = file.read()
+    time_Val = _lastNumber(TIMESTAMP_LINE, content) / 10 ** 6  # Converting TimeStamp from micro seconds to seconds
+    frame_Num = _lastNumber(COUNTER_LINE, content)
+    return time_Val, frame_Num
+
+
+def readMetadata(folder_path, indexFile=None):
+    """
+    Reads the timestamps and frame counters of every metadata file in a folder.
+
+    Parameters:
+    - folder_path (str): Folder containing the metadata txt files.
+    - indexFile (str, optional): Path of a .npz index. If it matches the folder's current files
+      (names, sizes and modification times) it is loaded instead of parsing, otherwise it is rewritten.
+
+    Returns:
+    - timestamps (np.array): Frame timestamps in seconds, one per file.
+    - counter (np.array): Frame counters, one per file.
+    """
+    files = listMetadataFiles(folder_path)
+    names = np.array([name for name, _, _ in files], dtype=str)
+    sizes = np.array([size for _, size, _ in files], dtype=np.int64)
+    mtimes = np.array([mtime for _, _, mtime in files], dtype=np.int64)
+
+    if indexFile and os.path.exists(indexFile):
+        with np.load(indexFile) as index:
+            if (np.array_equal(index['files'], names) and np.array_equal(index['sizes'], sizes)
+                    and np.array_equal(index['mtimes'], mtimes)):
+                return index['timestamps'], index['counter']
+
+    values = np.array([parseMetadataFile(os.path.join(folder_path, name)) for name in names],
+                      dtype=np.float64).reshape(-1, 2)
+    timestamps, counter = values[:, 0].copy(), values[:, 1].copy()
+
+    if indexFile:
+        with open(indexFile, 'wb') as file:  # Keeps the exact filename, np.savez would append .npz
+            np.savez(file, files=names, sizes=sizes, mtimes=mtimes, timestamps=timestamps, counter=counter)
+
+    return timestamps, counter
+
+
+def findOutOfOrderFrames(counter):
+    """
+    Returns the indices of the frames whose counter is lower than the one of the frame before.
+    """
+    return np.flatnonzero(np.diff(counter) < 0) + 1
+
+
+def timeStamps(folder_path, indexFile=None):
+    """
+    Returns the frame timestamps (in seconds) of a folder of L515 metadata files, one per file.
+    Frames that are out of order are reported, see readMetadata for the optional index file.
+    """
+    timeStamps, counter = readMetadata(folder_path, indexFile)
+
+    outOfOrder = findOutOfOrderFrames(counter)
+    if outOfOrder.size > 0:
+        # Checks if frames are in order
+        shown = ", ".join(f"{i} (counter {counter[i - 1]:.0f} -> {counter[i]:.0f})" for i in outOfOrder[:10])
+        more = f" and {outOfOrder.size - 10} more" if outOfOrder.size > 10 else ""
+        print(f"Warning: {outOfOrder.size} frames out of order in {folder_path} at index {shown}{more}.")
+
     return timeStamps
@@ -0,0 +1,151 @@
+from functools import partial
+import numpy as np
+
+
+class NeighborIndex:
+    """
+    One KD-tree per frame that answers the neighborhood queries of all outlier filters.
+
+    The tree is built once over the points that survive the NaN/Z pre-filter. Filters remove
+    points by clearing them in the `alive` mask instead of rebuilding the tree. Neighbor counts
+    among the alive points are the counts in the full tree minus the counts in a small tree over
+    the removed points (outliers are usually a few percent). Once more points are removed than
+    kept, e.g. everything outside the clusters, a tree over the alive points is used instead,
+    whichever is smaller.
+
+    The statistical and radius filters reproduce Open3D's remove_statistical_outlier and
+    remove_radius_outlier: the k nearest neighbors include the point itself, and a point passes
+    the radius filter with at least nb_points other points within the radius.
+
+    Parameters:
+    - points (np.array): (N, 3) points. They are not copied, so do not modify them.
+    - workers (int): Threads for the tree queries, -1 uses all cores.
+    """
+
+    def __init__(self, points, workers=-1):
+        from scipy.spatial import cKDTree
+
+        # Unbalanced trees without node compaction build several times faster and query as fast
+        self._cKDTree = partial(cKDTree, balanced_tree=False, compact_nodes=False)
+        self.points = points
+        self.workers = workers
+        self.tree = self._cKDTree(points)
+        self.alive = np.ones(len(points), dtype=bool)
+        self._deltaTree = None  # Tree over the removed or the alive points, whichever is smaller
+        self._deltaOfRemoved = True
+
+    def aliveIndices(self):
+        return np.flatnonzero(self.alive)
+
+    def remove(self, indices):
+        """
+        Marks points (indices into the original points) as removed.
+        """
+        if len(indices):
+            self.alive[indices] = False
+            self._deltaTree = None
+
+    def keepOnly(self, indices):
+        """
+        Marks every point except the given ones as removed.
+        """
+        alive = np.zeros_like(self.alive)
+        alive[indices] = True
+        if not np.array_equal(alive, self.alive):
+            self.alive = alive
+            self._deltaTree = None
+
+    def _delta(self):
+        if self._deltaTree is None:
+            removed = np.count_nonzero(~self.alive)
+            self._deltaOfRemoved = removed <= len(self.alive) - removed
+            subset = ~self.alive if self._deltaOfRemoved else self.alive
+            self._deltaTree = self._cKDTree(self.points[subset])
+        return self._deltaTree
+
+    def radiusCounts(self, indices, radius):
+        """
+        Number of alive points within radius of each of the given points, the point itself included.
+        """
+        queries = self.points[indices]
+        if self.alive.all():
+            return self.tree.query_ball_point(queries, radius, workers=self.workers, return_length=True)
+        delta = self._delta()
+        deltaCounts = delta.query_ball_point(queries, radius, workers=self.workers, return_length=True)
+        if not self._deltaOfRemoved:
+            return deltaCounts
+        return self.tree.query_ball_point(queries, radius, workers=self.workers, return_length=True) - deltaCounts
+
+    def meanNeighborDistances(self, indices, k):
+        """
+        Mean distance of each of the given points to its k nearest alive points, itself included.
+        """
+        queries = self.points[indices]
+        if self.alive.all():
+            distances, _ = self.tree.query(queries, k=k, workers=self.workers)
+        else:
+            # Nearest neighbors are not subtractive, query a tree over the alive points only
+            aliveTree = self._cKDTree(self.points[self.alive])
+            distances, _ = aliveTree.query(queries, k=k, workers=self.workers)
+        distances = np.where(np.isinf(distances), np.nan, distances)  # Fewer than k points
+        return np.nanmean(distances.reshape(len(queries), -1), axis=1)
+
+    def statisticalFilter(self, nb_neighbors=20, std_ratio=2.0):
+        """
+        Removes the alive points whose mean distance to their neighbors is more than std_ratio
+        standard deviations above the cloud's mean, like remove_statistical_outlier.
+
+        Returns:
+        - np.array: Indices of the points still alive.
+        """
+        indices = self.aliveIndices()
+        if len(indices) == 0:
+            return indices
+        meanDistances = self.meanNeighborDistances(indices, nb_neighbors)
+        valid = meanDistances > 0
+        if np.count_nonzero(valid) < 2:
+            self.remove(indices[~valid])
+            return self.aliveIndices()
+        threshold = meanDistances[valid].mean() + std_ratio * meanDistances[valid].std(ddof=1)
+        self.remove(indices[~(valid & (meanDistances < threshold))])
+        return self.aliveIndices()
+
+    def radiusFilter(self, nb_points, radius, indices=None, extraNeighbors=8):
+        """
+        Removes the points with fewer than nb_points other alive points within radius, like
+        remove_radius_outlier. All neighbor counts are taken before any point is removed.
+
+        Instead of counting every neighbor in the radius, which is slow in dense regions, each point
+        only looks up its nb_points + 1 + extraNeighbors nearest points. A point passes once enough
+        of them are alive and within the radius, and fails if fewer than that many points are in
+        the radius at all. Only the rare points in between, with too many removed points close by,
+        are counted exactly.
+
+        Parameters:
+        - indices (np.array, optional): Alive points to filter, in the order to return them.
+          Defaults to all alive points.
+        - extraNeighbors (int): Extra nearest points looked up to make up for removed ones.
+
+        Returns:
+        - np.array: The filtered indices, in their original order.
+        """
+        if indices is None:
+            indices = self.aliveIndices()
+        if len(indices) == 0:
+            return indices
+
+        k = min(nb_points + 1 + (0 if self.alive.all() else extraNeighbors), len(self.points))
+        distances, neighbors = self.tree.query(self.points[indices], k=k, distance_upper_bound=radius,
+                                               workers=self.workers)
+        distances = distances.reshape(len(indices), k)
+        neighbors = neighbors.reshape(len(indices), k)
+        within = np.isfinite(distances)  # Missing neighbors come back as inf with index len(points)
+        aliveWithin = within & self.alive[np.minimum(neighbors, len(self.points) - 1)]
+
+        keep = np.count_nonzero(aliveWithin, axis=1) > nb_points  # The point itself is among them
+        undecided = ~keep & within[:, -1]  # All k looked-up points in the radius, but too many removed
+        if undecided.any():
+            keep[undecided] = self.radiusCounts(indices[undecided], radius) > nb_points
+
+        self.remove(indices[~keep])
+        return indices[keep]
@@ -0,0 +1,88 @@
+from array import array
+import numpy as np
+
+
+class RunMetrics:
+    """
+    Collects the per-frame stats of cleanAndClusterPointCloud (wall time and surviving point count
+    of every stage) over a run and summarises them with percentiles.
+
+    Values are kept in compact float arrays, one per stage, so a long run costs a few bytes per frame.
+    With maxSamples, only every stride-th frame is kept, the stride doubling (and every other kept
+    value dropped) whenever more than maxSamples frames are held, so memory stays bounded on
+    captures of any length. Frame counts, means and totals stay exact, the percentiles then come
+    from the evenly spaced sample.
+
+    Parameters:
+    - maxSamples (int, optional): Largest number of frames kept for the percentiles, None keeps all.
+    """
+
+    def __init__(self, maxSamples=None):
+        self.frames = 0
+        self.maxSamples = maxSamples
+        self.stride = 1
+        self.timings = {}
+        self.points = {}
+        self.sums = {'timings': {}, 'points': {}}  # Stage -> [frames, total] over all frames
+
+    def add(self, frameStats):
+        """
+        Adds one frame's stats dict, as filled by cleanAndClusterPointCloud(stats=...).
+        """
+        sampled = self.frames % self.stride == 0
+        self.frames += 1
+        for kind, samples in (('timings', self.timings), ('points', self.points)):
+            for stage, value in frameStats.get(kind, {}).items():
+                stageSum = self.sums[kind].setdefault(stage, [0, 0.0])
+                stageSum[0] += 1
+                stageSum[1] += value
+                if sampled:
+                    samples.setdefault(stage, array('d')).append(value)
+
+        if self.maxSamples is not None and sampled and -(-self.frames // self.stride) > self.maxSamples:
+            # Halve the sample, keeping every other frame
+            self.stride *= 2
+            for samples in (self.timings, self.points):
+                for stage in samples:
+                    samples[stage] = samples[stage][::2]
+
+    def _summarize(self, kind, stage, percentiles):
+        values = np.frombuffer(getattr(self, kind)[stage], dtype=np.float64)
+        frames, total = self.sums[kind][stage]
+        summary = {'frames': frames, 'mean': total / frames, 'total': float(total)}
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            summary[f"p{p:g}"] = float(value)
+        return summary
+
+    def report(self, percentiles=(50, 90, 99)):
+        """
+        Returns the per-stage summary (frame count, mean, total and percentiles) of the times in
+        seconds and of the point counts. Stages a frame did not reach are left out of its statistics.
+        """
+        return {
+            'frames': self.frames,
+            'timings': {stage: self._summarize('timings', stage, percentiles) for stage in self.timings},
+            'points': {stage: self._summarize('points', stage, percentiles) for stage in self.points},
+        }
+
+    def printReport(self, percentiles=(50, 90, 99)):
+        """
+        Prints the per-stage report as a table, times in milliseconds.
+        """
+        if self.frames == 0:
+            return
+
+        report = self.report(percentiles)
+        columns = [f"p{p:g}" for p in percentiles]
+        totalTime = sum(summary['total'] for summary in report['timings'].values()) or 1.0
+
+        print(f"Per-stage timings over {self.frames} frames (ms):")
+        print(f"  {'stage':<20}{'share':>8}" + "".join(f"{column:>10}" for column in columns))
+        for stage, summary in report['timings'].items():
+            share = summary['total'] / totalTime
+            print(f"  {stage:<20}{share:>8.1%}" + "".join(f"{summary[column] * 1000:>10.1f}" for column in columns))
+
+        print("Points after each stage:")
+        print(f"  {'stage':<20}{'frames':>8}" + "".join(f"{column:>10}" for column in columns))
+        for stage, summary in report['points'].items():
+            print(f"  {stage:<20}{summary['frames']:>8}" + "".join(f"{summary[column]:>10.0f}" for column in columns))
@@ -1,38 +1,179 @@
-import open3d as o3d
+import json
 import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from frame_cache import fileDigest
 
 
-def convertPLYtoPCD(input_folder, output_folder):
+# Records what every PCD in an output folder was converted from, see convertPLYtoPCD
+CONVERSION_MANIFEST = "conversion_manifest.json"
+# Subfolder of the output folder for PCD files being written, so a partial file is never a frame
+CONVERSION_TEMP_FOLDER = ".converting"
+
+
+def _sourceState(input_file, entry, check):
+    """
+    Identity of a source file: its size and modification time, plus its content hash with
+    check="hash". The hash is only computed when size or modification time differ from the
+    manifest entry, so unchanged files are not read again.
+
+    Returns:
+    - (dict, bool): The state to record and whether it matches the manifest entry.
+    """
+    stat = os.stat(input_file)
+    state = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    entry = entry or {}
+    if entry.get('size') == state['size'] and entry.get('mtime_ns') == state['mtime_ns']:
+        if 'sha1' in entry:
+            state['sha1'] = entry['sha1']
+        elif check == "hash":
+            state['sha1'] = fileDigest(input_file)  # First hash check of a file converted by mtime
+        return state, True
+
+    if check == "hash":
+        state['sha1'] = fileDigest(input_file)
+        # Same size and content, only the modification time moved (e.g. the test was copied)
+        return state, entry.get('size') == state['size'] and entry.get('sha1') == state['sha1']
+    return state, False
+
+
+def _convertFrame(input_file, output_file, write_ascii=False, compressed=False):
+    """
+    Converts one PLY file to PCD and returns the size of the PLY file in bytes.
+    Runs in a worker process when convertPLYtoPCD is called with workers > 1.
+    """
+    import open3d as o3d
+
+    pcd = o3d.io.read_point_cloud(input_file)
+    # Written in a temporary subfolder first (Open3D needs the .pcd suffix), so an interrupted
+    # conversion never leaves a truncated PCD among the frames
+    temp_file = os.path.join(os.path.dirname(output_file), CONVERSION_TEMP_FOLDER,
+                             f"{os.getpid()}_{os.path.basename(output_file)}")
+    if not o3d.io.write_point_cloud(temp_file, pcd, write_ascii=write_ascii, compressed=compressed):
+        raise IOError(f"Could not write {output_file}")
+    os.replace(temp_file, output_file)
+    return os.path.getsize(input_file)
+
+
+def convertPLYtoPCD(input_folder, output_folder, workers=1, check="mtime", write_ascii=False, compressed=False,
+                    force=False):
     """
     Converts all PLY files in the input_folder to PCD format
     and saves them in the output_folder.
 
+    Outputs that are already up to date are skipped: a manifest in the output folder records the
+    size and modification time (and with check="hash" the content hash) of every converted PLY
+    and the write options, so re-running on a converted test only stats the files.
+
     Parameters:
     - input_folder (str): Path to the folder containing PLY files.
     - output_folder (str): Path to the folder where PCD files will be saved.
+    - workers (int): Number of worker processes, 1 converts in this process, None uses one per core.
+    - check (str): "mtime" compares size and modification time, "hash" also the file content
+      (slower, but survives copies that change modification times).
+    - write_ascii (bool): Write ASCII instead of binary PCD.
+    - compressed (bool): Write compressed binary PCD, smaller on disk but slower to write.
+    - force (bool): Convert every file, even if its output is up to date.
 
     Returns:
-    - List of converted files with their output paths.
+    - List of converted files with their output paths, in file name order.
     """
-    converted_files = []
+    if check not in ("mtime", "hash"):
+        raise ValueError(f"Unknown check: {check}, use 'mtime' or 'hash'.")
+
+    # Create the output folder if it does not exist, and drop what interrupted runs left behind
+    temp_folder = os.path.join(output_folder, CONVERSION_TEMP_FOLDER)
+    shutil.rmtree(temp_folder, ignore_errors=True)
+    os.makedirs(temp_folder)
 
-    # Create the output folder if it does not exist
-    if not os.path.exists(output_folder):
-        os.makedirs(output_folder)
+    manifest_file = os.path.join(output_folder, CONVERSION_MANIFEST)
+    manifest = {}
+    if os.path.exists(manifest_file) and not force:
+        try:
+            with open(manifest_file) as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            manifest = {}  # A damaged manifest only costs a full conversion
 
-    # Iterate through all files in the input folder
-    for filename in os.listdir(input_folder):
-        if filename.endswith(".ply"):
-            input_file = os.path.join(input_folder, filename)
+    options = {'write_ascii': write_ascii, 'compressed': compressed}
+    filenames = sorted(f for f in os.listdir(input_folder) if f.endswith(".ply"))
+    output_files = []
+    pending = []
+    for filename in filenames:
+        input_file = os.path.join(input_folder, filename)
+        output_file = pcdExportPath(input_file, output_folder)
+        output_files.append(output_file)
 
-            # Load the PLY file
-            pcd = o3d.io.read_point_cloud(input_file)
+        entry = manifest.get(filename)
+        state, current = _sourceState(input_file, entry, check)
+        state.update(options)
+        if (current and all(entry.get(key) == value for key, value in options.items())
+                and os.path.exists(output_file) and os.path.getsize(output_file) == entry.get('output_size')):
+            if entry != dict(state, output_size=entry['output_size']):
+                manifest[filename] = dict(state, output_size=entry['output_size'])  # Record the new mtime
+            continue
+        pending.append((filename, input_file, output_file, state))
+
+    start = time.perf_counter()
+    bytes_read = 0
+    convert = partial(_convertFrame, write_ascii=write_ascii, compressed=compressed)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers != 1 and len(pending) > 1 else None
+    try:
+        inputs = [input_file for _, input_file, _, _ in pending]
+        outputs = [output_file for _, _, output_file, _ in pending]
+        sizes = executor.map(convert, inputs, outputs) if executor else map(convert, inputs, outputs)
+        for (filename, _, output_file, state), size in zip(pending, sizes):
+            bytes_read += size
+            manifest[filename] = dict(state, output_size=os.path.getsize(output_file))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        # Also record the files converted before an interruption
+        temp_file = manifest_file + f".{os.getpid()}.tmp"
+        with open(temp_file, 'w') as file:
+            json.dump(manifest, file, indent=1)
+        os.replace(temp_file, manifest_file)
+
+    elapsed = time.perf_counter() - start
+    skipped = len(filenames) - len(pending)
+    if pending:
+        print(f"Converted {len(pending)} PLY files in {elapsed:.1f} s "
+              f"({len(pending) / elapsed:.1f} frames/s, {bytes_read / 1e6 / elapsed:.1f} MB/s), "
+              f"{skipped} already up to date.")
+    else:
+        print(f"All {skipped} PCD files in {output_folder} are up to date.")
+
+    return output_files
+
+
+def pcdExportPath(input_file, output_folder):
+    """
+    Returns the path a PLY frame is exported to as PCD inside output_folder.
+    """
+    return os.path.join(output_folder, os.path.basename(input_file).replace(".ply", ".pcd"))
+
+
+def loadPLYFrame(input_file, export_folder=None):
+    """
+    Decodes a single PLY frame into memory so it can go straight into the filtering pipeline.
+
+    Parameters:
+    - input_file (str): Path to the PLY file.
+    - export_folder (str, optional): If given, the decoded frame is also written there as PCD,
+      with the same name convertPLYtoPCD would use.
+
+    Returns:
+    - o3d.geometry.PointCloud: The decoded frame.
+    """
+    import open3d as o3d
 
-            # Define output file path
-            output_file = os.path.join(output_folder, filename.replace(".ply", ".pcd"))
+    pcd = o3d.io.read_point_cloud(input_file)
 
-            # Save the PCD file
-            o3d.io.write_point_cloud(output_file, pcd)
-            converted_files.append(output_file)
+    if export_folder:
+        os.makedirs(export_folder, exist_ok=True)
+        o3d.io.write_point_cloud(pcdExportPath(input_file, export_folder), pcd)
 
-    return converted_files
+    return pcd
@@ -1,63 +1,231 @@
-import open3d as o3d
+import time
 import numpy as np
 from bounding_box import calculateBoundingBoxDimensions
+from neighbor_index import NeighborIndex
+from point_cloud_reader import readPoints
+
+
+def preFilterMask(points, dynamic_z_offset=0.0, roi=None, counts=None):
+    """
+    Finds the points that are finite and not closer than the nearest finite Z plus dynamic_z_offset.
+    Works on the (N, 3) array in place, without building intermediate point arrays or clouds.
+    With roi = (min_bound, max_bound), only points inside that axis-aligned box are kept as well.
+    The Z threshold is still taken from the whole frame, so it does not depend on the ROI.
+    If counts is a dict, the number of finite points is stored under 'nan_removal'.
+
+    Returns:
+    - np.array: Boolean mask of the points to keep.
+    """
+    keep = np.isfinite(points).all(axis=1)
+    if counts is not None:
+        counts['nan_removal'] = int(np.count_nonzero(keep))
+    if not keep.any():
+        return keep
+
+    z_values = points[:, 2]
+    # In float64 even for float32 points, so both give the same mask
+    max_z = np.float64(np.min(z_values, where=keep, initial=np.inf)) + dynamic_z_offset
+    with np.errstate(invalid='ignore'):  # NaN rows are already masked out
+        keep &= z_values >= max_z
+        if roi is not None:
+            keep &= np.all((points >= roi[0]) & (points <= roi[1]), axis=1)
+    return keep
+
+
+def earlyRejectionReason(points, eps, minPoints, minClusterSize, checkDensity=True, maxGridCells=1000000):
+    """
+    Cheap test, right after the Z crop, for frames in which DBSCAN cannot find a large enough
+    cluster, e.g. because the object is missing or smeared by motion blur. Both checks are
+    conservative, so no frame that would have produced a result is rejected:
+    - Fewer points than minClusterSize: the later filters only remove points.
+    - Density: the points are counted on a coarse occupancy grid with cells of size eps. The eps-ball
+      around any point lies within the 3x3x3 block of cells around it, so if no block holds
+      minPoints points, no point is a DBSCAN core point and there are no clusters.
+      Skipped when the grid would have more than maxGridCells cells.
+
+    Returns:
+    - str or None: 'too_few_points' or 'no_dense_region', None if the frame should be processed.
+    """
+    if len(points) < minClusterSize:
+        return 'too_few_points'
+    if not checkDensity:
+        return None
+
+    cells = np.floor((points - points.min(axis=0)) / eps).astype(np.int64)
+    shape = cells.max(axis=0) + 1
+    if np.prod(shape) > maxGridCells:
+        return None
+    grid = np.bincount(np.ravel_multi_index(cells.T, shape), minlength=np.prod(shape)).reshape(shape)
+
+    # Points in the 3x3x3 block around every cell, as a sum of 27 shifted views of the padded grid
+    padded = np.pad(grid, 1)
+    blockCounts = np.zeros(shape, dtype=np.int64)
+    for dx in range(3):
+        for dy in range(3):
+            for dz in range(3):
+                blockCounts += padded[dx:dx + shape[0], dy:dy + shape[1], dz:dz + shape[2]]
+    if blockCounts.max() < minPoints:
+        return 'no_dense_region'
+    return None
+
+
+def clusterDbscan(pcd, eps, minPoints, voxelSize=None):
+    """
+    Runs DBSCAN on a point cloud and returns one label per point (-1 for noise).
+
+    With voxelSize set, the points are first averaged per voxel and DBSCAN runs on the voxel
+    centroids only, then every point takes the label of its voxel. minPoints is scaled by the mean
+    number of points per voxel so density thresholds stay comparable. This trades a small loss in
+    boundary accuracy for a much smaller DBSCAN problem, see compareDbscanFastPath.
+    """
+    if not voxelSize:
+        return np.array(pcd.cluster_dbscan(eps=eps, min_points=minPoints, print_progress=False))
+
+    points = np.asarray(pcd.points)
+    voxelIndex = np.floor((points - points.min(axis=0)) / voxelSize).astype(np.int64)
+    gridShape = voxelIndex.max(axis=0) + 1
+    voxelKeys = np.ravel_multi_index(voxelIndex.T, gridShape)
+    _, inverse, counts = np.unique(voxelKeys, return_inverse=True, return_counts=True)
+
+    centroids = np.column_stack([np.bincount(inverse, weights=points[:, axis]) for axis in range(3)])
+    centroids /= counts[:, None]
+
+    import open3d as o3d
+
+    downPcd = o3d.geometry.PointCloud()
+    downPcd.points = o3d.utility.Vector3dVector(centroids)
+    scaledMinPoints = max(1, int(round(minPoints * len(counts) / len(points))))
+    voxelLabels = np.array(downPcd.cluster_dbscan(eps=eps, min_points=scaledMinPoints, print_progress=False))
+    return voxelLabels[inverse]
+
 
 def cleanAndClusterPointCloud(inputFile, outputFile=None,
                               useStatisticalFilter=True, useRadiusFilter=True,
                               dynamic_z_offset=0.0,  # Offset for Z filter from the furthest Z
                               eps=0.05, minPoints=100, minClusterSize=1000,
-                              finalRadiusFilter=True):
+                              finalRadiusFilter=True, dbscanVoxelSize=None, roi=None, stats=None,
+                              obbSampleSize=None, neighborIndex=False, earlyRejection=True, queryThreads=-1):
     """
     Function to clean, dynamically crop, and cluster a point cloud.
     The Z-axis filter is dynamically applied at the beginning, and plane removal is disabled.
     If no valid points remain after filtering, returns default values and continues.
+
+    inputFile can be a path to any point cloud file Open3D reads (PCD, PLY) or an already
+    decoded o3d.geometry.PointCloud, which lets frames be streamed in without intermediate files.
+
+    dbscanVoxelSize enables the voxel-downsampled DBSCAN fast path (see clusterDbscan), None keeps
+    the exact full-resolution clustering.
+
+    obbSampleSize bounds the cost of the oriented bounding box: its axes come from a subsample of
+    at most that many points (see calculateBoundingBoxDimensions), None uses the whole cloud.
+
+    neighborIndex=True runs the statistical and both radius filters on one shared KD-tree per frame
+    (see neighbor_index.NeighborIndex) instead of letting Open3D build a new one for every filter.
+    The kept points are the same. DBSCAN still uses Open3D. queryThreads is the number of threads
+    for its queries, -1 uses all cores; use 1 when frames already run in parallel processes.
+
+    earlyRejection skips frames right after the Z crop when they cannot yield a cluster of
+    minClusterSize points (see earlyRejectionReason). The density check is only exact for the
+    full-resolution DBSCAN, so it is not applied with dbscanVoxelSize.
+
+    roi = (min_bound, max_bound) limits the whole pipeline to an axis-aligned region, e.g. around
+    where the object was in the previous frame (see frame_tracking.FrameTracker).
+
+    If stats is a dict, it is filled with:
+    - 'timings': wall time of every step in seconds ('load', 'prefilter' for the combined NaN removal
+      and Z crop, 'neighbor_index' for building the shared index, 'statistical_filter',
+      'radius_filter', 'dbscan', 'final_radius_filter', 'bounding_box', 'save').
+    - 'points': number of points left after every step ('load', 'nan_removal', 'z_crop', ...).
+      A step that emptied the cloud is recorded with 0, later steps are missing.
+    - 'rejected': reason the frame was skipped by the early rejection, if it was.
+    - 'skipped_clusters': number of clusters dropped for being smaller than minClusterSize
+      (printed instead when no stats dict is given).
+    See pipeline_metrics.RunMetrics for combining them over a run.
     """
 
     # Default output if filtering fails
     default_bbox = np.zeros(3)  # [0, 0, 0] for bounding box dimensions
     #print(f"Loading point cloud from '{inputFile}'...")
 
-    # Step 1: Load the point cloud from the PCD file
-    pcd = o3d.io.read_point_cloud(inputFile)
-    if pcd.is_empty():
-        #print(f"Error: Failed to read the file '{inputFile}' or file is empty.")
-        return None, None, default_bbox
+    # Per-step wall times and point counts, only reported if the caller passed a stats dict
+    timings = {}
+    pointCounts = {}
+    if stats is not None:
+        stats['timings'] = timings
+        stats['points'] = pointCounts
+    stepStart = time.perf_counter()
 
-    #print(f"Successfully loaded point cloud with {len(pcd.points)} points.")
+    def endStep(step, pointCloud=None, count=None):
+        nonlocal stepStart
+        now = time.perf_counter()
+        timings[step] = now - stepStart
+        stepStart = now
+        if pointCloud is not None:
+            count = len(pointCloud.points)
+        if count is not None:
+            pointCounts[step] = count
 
-    # Step 2: Remove NaN or Inf values
-    #print("Removing NaN and Inf values...")
-    points = np.asarray(pcd.points)
-    validIndices = np.isfinite(points).all(axis=1)
-    cleanedPoints = points[validIndices]
-    cleanedPcd = o3d.geometry.PointCloud()
-    cleanedPcd.points = o3d.utility.Vector3dVector(cleanedPoints)
-    #print(f"Removed invalid points. Remaining points: {len(cleanedPoints)}.")
+    import open3d as o3d  # Deferred so modules that only import this one start quickly
 
-    if cleanedPcd.is_empty():
-        #print("Error: No valid points after NaN/Inf removal.")
+    # Step 1: Load the points, unless the cloud was handed over in memory. Binary files are
+    # memory-mapped (see point_cloud_reader.readXYZ), so only the surviving points get copied below.
+    if isinstance(inputFile, o3d.geometry.PointCloud):
+        points = np.asarray(inputFile.points)  # View into the Open3D buffer, no copy
+    else:
+        points = readPoints(inputFile)
+    endStep('load', count=len(points))
+    if len(points) == 0:
+        #print(f"Error: Failed to read the file '{inputFile}' or file is empty.")
         return None, None, default_bbox
 
-    # Step 3: Dynamically assign and apply the Z-axis filter
-    z_values = np.asarray(cleanedPcd.points)[:, 2]
-    max_z = np.min(z_values) + dynamic_z_offset
-    #print(f"Applying dynamic Z filter: Z <= {max_z}...")
-    within_bounds = z_values >= max_z
-    filteredPoints = np.asarray(cleanedPcd.points)[within_bounds]
-
-    if len(filteredPoints) == 0:
-        #print("Error: No points left after dynamic Z filtering.")
+    # Steps 2-3: Remove NaN/Inf values and apply the dynamic Z-axis filter in one masked pass
+    keep = preFilterMask(points, dynamic_z_offset, roi, counts=pointCounts)
+    pointCounts['z_crop'] = int(np.count_nonzero(keep))
+    if pointCounts['z_crop'] == 0:
+        #print("Error: No points left after NaN/Inf removal and dynamic Z filtering.")
+        endStep('prefilter')
         return None, None, default_bbox
 
-    filteredPcd = o3d.geometry.PointCloud()
-    filteredPcd.points = o3d.utility.Vector3dVector(filteredPoints)
-    cleanedPcd = filteredPcd  # Update the cleaned point cloud to the Z-filtered version
-    #print(f"Points remaining after Z filter: {len(filteredPoints)}.")
+    # Only the surviving points are copied, once, into the new cloud
+    filteredPoints = np.asarray(points[keep], dtype=np.float64)
+    if earlyRejection:
+        rejection = earlyRejectionReason(filteredPoints, eps, minPoints, minClusterSize,
+                                         checkDensity=not dbscanVoxelSize)
+        if rejection is not None:
+            if stats is not None:
+                stats['rejected'] = rejection
+            endStep('prefilter')
+            return None, None, default_bbox
+
+    cleanedPcd = o3d.geometry.PointCloud()
+    cleanedPcd.points = o3d.utility.Vector3dVector(filteredPoints)
+    endStep('prefilter')
+    #print(f"Points remaining after Z filter: {len(cleanedPcd.points)}.")
+
+    index = None
+    if neighborIndex and (useStatisticalFilter or useRadiusFilter or finalRadiusFilter):
+        # Steps 4-5 on the shared index: points are only masked out, the cloud is rebuilt once for DBSCAN
+        index = NeighborIndex(filteredPoints, workers=queryThreads)
+        endStep('neighbor_index')
+        if useStatisticalFilter:
+            aliveIndices = index.statisticalFilter(nb_neighbors=20, std_ratio=2.0)
+            endStep('statistical_filter', count=len(aliveIndices))
+            if len(aliveIndices) == 0:
+                return None, None, default_bbox
+        if useRadiusFilter:
+            aliveIndices = index.radiusFilter(nb_points=16, radius=0.05)
+            endStep('radius_filter', count=len(aliveIndices))
+            if len(aliveIndices) == 0:
+                return None, None, default_bbox
+        aliveIndices = index.aliveIndices()
+        if len(aliveIndices) < len(filteredPoints):
+            cleanedPcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(filteredPoints[aliveIndices]))
 
     # Step 4: Apply Statistical Outlier Removal (optional)
-    if useStatisticalFilter:
+    if useStatisticalFilter and index is None:
         #print("Applying Statistical Outlier Removal...")
         cleanedPcd, _ = cleanedPcd.remove_statistical_outlier(nb_neighbors=20, std_ratio=2.0)
+        endStep('statistical_filter', cleanedPcd)
         #print(f"Points remaining after Statistical Outlier Removal: {len(cleanedPcd.points)}")
 
         if cleanedPcd.is_empty():
@@ -65,9 +233,10 @@ def cleanAndClusterPointCloud(inputFile, outputFile=None,
             return None, None, default_bbox
 
     # Step 5: Apply Radius Outlier Removal (optional)
-    if useRadiusFilter:
+    if useRadiusFilter and index is None:
         #print("Applying Radius Outlier Removal...")
         cleanedPcd, _ = cleanedPcd.remove_radius_outlier(nb_points=16, radius=0.05)
+        endStep('radius_filter', cleanedPcd)
         #print(f"Points remaining after Radius Outlier Removal: {len(cleanedPcd.points)}")
 
         if cleanedPcd.is_empty():
@@ -76,28 +245,46 @@ def cleanAndClusterPointCloud(inputFile, outputFile=None,
 
     # Step 6: Apply Euclidean Clustering to isolate objects
     #print("Applying Euclidean Clustering...")
-    labels = np.array(cleanedPcd.cluster_dbscan(eps=eps, min_points=minPoints, print_progress=False))
-    maxLabel = labels.max()
-    #print(f"Found {maxLabel + 1} clusters.")
+    labels = clusterDbscan(cleanedPcd, eps, minPoints, voxelSize=dbscanVoxelSize)
+    #print(f"Found {labels.max() + 1} clusters.")
 
-    clusteredPcd = o3d.geometry.PointCloud()
-    for i in range(maxLabel + 1):
-        indices = np.where(labels == i)[0]
-        cluster = cleanedPcd.select_by_index(indices)
+    # Count every cluster once and keep the large ones in a single selection,
+    # ordered by cluster label as the clusters used to be concatenated
+    clustered = labels >= 0
+    clusterSizes = np.bincount(labels[clustered], minlength=labels.max() + 1)
+    keptClusters = clusterSizes >= minClusterSize
+    clustered[clustered] = keptClusters[labels[clustered]]
+    indices = np.flatnonzero(clustered)
+    indices = indices[np.argsort(labels[indices], kind='stable')]
+    clusteredPcd = cleanedPcd.select_by_index(indices)
 
-        if len(indices) >= minClusterSize:
-            clusteredPcd += cluster
-        else:
-            print(f"Skipping small/insignificant cluster {i}.")
+    skippedClusters = int(np.count_nonzero(~keptClusters))
+    if stats is not None:
+        stats['skipped_clusters'] = skippedClusters
+    elif skippedClusters:
+        print(f"Skipping {skippedClusters} small/insignificant clusters.")
+
+    endStep('dbscan', clusteredPcd)
 
     if clusteredPcd.is_empty():
         #print("Error: No clusters found after filtering.")
         return None, None, default_bbox
 
     # Step 7: Apply final Radius Outlier Removal (optional)
-    if finalRadiusFilter:
+    if finalRadiusFilter and index is not None:
+        # Same index, with everything outside the kept clusters masked out, in cluster order
+        clusterIndices = aliveIndices[indices]
+        index.keepOnly(clusterIndices)
+        finalIndices = index.radiusFilter(nb_points=50, radius=0.02, indices=clusterIndices)
+        clusteredPcd = o3d.geometry.PointCloud(o3d.utility.Vector3dVector(filteredPoints[finalIndices]))
+        endStep('final_radius_filter', clusteredPcd)
+
+        if clusteredPcd.is_empty():
+            return None, None, default_bbox
+    elif finalRadiusFilter:
         #print("Applying final Radius Outlier Removal...")
         clusteredPcd, _ = clusteredPcd.remove_radius_outlier(nb_points=50, radius=0.02)
+        endStep('final_radius_filter', clusteredPcd)
         #print(f"Points remaining after final Radius Outlier Removal: {len(clusteredPcd.points)}")
 
         if clusteredPcd.is_empty():
@@ -105,11 +292,55 @@ def cleanAndClusterPointCloud(inputFile, outputFile=None,
             return None, None, default_bbox
 
     # Step 8: Calculate bounding box dimensions and save final point cloud
-    bbox, bboxSize = calculateBoundingBoxDimensions(clusteredPcd)
+    bbox, bboxSize = calculateBoundingBoxDimensions(clusteredPcd, sampleSize=obbSampleSize)
+    endStep('bounding_box', clusteredPcd)
 
     if outputFile:
         o3d.io.write_point_cloud(outputFile, clusteredPcd)
+        endStep('save')
         #print(f"Saved cleaned and clustered point cloud to '{outputFile}'")
 
     #print("Processing complete.")
-    return clusteredPcd, bbox, bboxSize
\ No newline at end of file
+    return clusteredPcd, bbox, bboxSize
+
+
+def compareDbscanFastPath(inputFile, dbscanVoxelSize, tolerance=0.02, **kwargs):
+    """
+    Runs cleanAndClusterPointCloud on one frame with the exact and the voxel-downsampled DBSCAN
+    and reports how far the bounding box extents drift and how much time the fast path saves.
+
+    Parameters:
+    - inputFile (str or o3d.geometry.PointCloud): The frame to check.
+    - dbscanVoxelSize (float): Voxel size for the fast path.
+    - tolerance (float): Largest accepted relative extent error.
+    - kwargs: Any other cleanAndClusterPointCloud parameters, used for both runs.
+
+    Returns:
+    - dict with both extents, the maximum relative extent error, the DBSCAN times of both paths
+      and whether the error is within tolerance.
+    """
+    exactStats, fastStats = {}, {}
+    _, _, exactExtent = cleanAndClusterPointCloud(inputFile, stats=exactStats, **kwargs)
+    _, _, fastExtent = cleanAndClusterPointCloud(inputFile, dbscanVoxelSize=dbscanVoxelSize,
+                                                 stats=fastStats, **kwargs)
+
+    # OBB axes can come out in a different order, so compare the sorted extents
+    exactSorted = np.sort(exactExtent)
+    fastSorted = np.sort(fastExtent)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        relativeError = np.abs(fastSorted - exactSorted) / exactSorted
+    maxError = float(np.nanmax(relativeError)) if np.any(exactSorted > 0) else float('nan')
+
+    exactTime = exactStats['timings'].get('dbscan', float('nan'))
+    fastTime = fastStats['timings'].get('dbscan', float('nan'))
+    print(f"DBSCAN exact: {exactTime:.3f} s, voxel {dbscanVoxelSize}: {fastTime:.3f} s "
+          f"({exactTime / fastTime:.1f}x), max extent error {maxError:.2%} (tolerance {tolerance:.2%})")
+
+    return {
+        'exact_extent': exactExtent,
+        'fast_extent': fastExtent,
+        'max_relative_error': maxError,
+        'exact_dbscan_time': exactTime,
+        'fast_dbscan_time': fastTime,
+        'within_tolerance': bool(maxError <= tolerance),
+    }
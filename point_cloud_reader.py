@@ -0,0 +1,153 @@
+import os
+import numpy as np
+
+# PLY property types and their NumPy codes
+PLY_TYPES = {
+    'char': 'i1', 'int8': 'i1', 'uchar': 'u1', 'uint8': 'u1',
+    'short': 'i2', 'int16': 'i2', 'ushort': 'u2', 'uint16': 'u2',
+    'int': 'i4', 'int32': 'i4', 'uint': 'u4', 'uint32': 'u4',
+    'float': 'f4', 'float32': 'f4', 'double': 'f8', 'float64': 'f8',
+}
+PLY_BYTE_ORDERS = {'binary_little_endian': '<', 'binary_big_endian': '>'}
+
+# PCD field TYPE letters (signed, unsigned, floating point)
+PCD_TYPES = {'I': 'i', 'U': 'u', 'F': 'f'}
+
+MAX_HEADER_BYTES = 1 << 16
+
+
+class UnsupportedLayout(ValueError):
+    """
+    Raised for files the memory-mapped reader cannot map, e.g. ASCII or compressed data.
+    readPoints falls back to Open3D for them.
+    """
+
+
+def _readHeader(file, terminator):
+    # Reads the text header line by line, up to and including the line starting with terminator
+    lines = []
+    size = 0
+    while True:
+        line = file.readline(MAX_HEADER_BYTES)
+        size += len(line)
+        if not line or size > MAX_HEADER_BYTES:
+            raise UnsupportedLayout("No complete header found.")
+        lines.append(line.decode('ascii', errors='replace').strip())
+        if lines[-1].split(' ', 1)[0] == terminator:
+            return lines, file.tell()
+
+
+def _plyLayout(path):
+    with open(path, 'rb') as file:
+        if file.readline().strip() != b"ply":
+            raise UnsupportedLayout(f"{path} is not a PLY file.")
+        lines, offset = _readHeader(file, 'end_header')
+
+    byteOrder = None
+    elements = []
+    for line in lines:
+        words = line.split()
+        if not words:
+            continue
+        if words[0] == 'format':
+            if words[1] not in PLY_BYTE_ORDERS:
+                raise UnsupportedLayout(f"PLY format '{words[1]}' is not binary.")
+            byteOrder = PLY_BYTE_ORDERS[words[1]]
+        elif words[0] == 'element':
+            elements.append((words[1], int(words[2]), []))
+        elif words[0] == 'property' and elements:
+            if words[1] == 'list':
+                elements[-1][2].append((words[-1], None))
+            else:
+                elements[-1][2].append((words[2], PLY_TYPES.get(words[1])))
+
+    # The points must come first, anything after them (e.g. faces) is never read
+    if byteOrder is None or not elements or elements[0][0] != 'vertex':
+        raise UnsupportedLayout(f"{path} does not start with a vertex element.")
+    _, count, properties = elements[0]
+    if any(code is None for _, code in properties):
+        raise UnsupportedLayout(f"{path} has list or unknown vertex properties.")
+    return np.dtype([(name, byteOrder + code) for name, code in properties]), count, offset
+
+
+def _pcdLayout(path):
+    with open(path, 'rb') as file:
+        lines, offset = _readHeader(file, 'DATA')
+
+    header = {}
+    for line in lines:
+        words = line.split()
+        if words and not words[0].startswith('#'):
+            header[words[0].upper()] = words[1:]
+    if header.get('DATA') != ['binary']:
+        raise UnsupportedLayout(f"PCD data '{' '.join(header.get('DATA', []))}' is not uncompressed binary.")
+
+    fields = header.get('FIELDS', [])
+    counts = header.get('COUNT', ['1'] * len(fields))
+    layout = []
+    for i, (name, size, kind, count) in enumerate(zip(fields, header.get('SIZE', []), header.get('TYPE', []),
+                                                       counts)):
+        field = (name if name != '_' else f"_padding{i}", f"<{PCD_TYPES[kind]}{size}")
+        layout.append(field + ((int(count),) if int(count) > 1 else ()))
+    if len(layout) != len(fields):
+        raise UnsupportedLayout(f"{path} has an incomplete PCD header.")
+    dtype = np.dtype(layout)
+
+    if 'POINTS' in header:
+        count = int(header['POINTS'][0])
+    else:
+        count = int(header['WIDTH'][0]) * int(header['HEIGHT'][0])
+    return dtype, count, offset
+
+
+def readXYZ(path):
+    """
+    Memory-maps the xyz coordinates of a binary PLY or PCD file as an (N, 3) NumPy array, without
+    reading or copying the file: only the pages that are used are loaded, from the page cache.
+
+    The file layout (e.g. the L515 export: float32 x, y, z, optionally followed by colors or normals,
+    then faces) is read from the header, and the array is a strided read-only view of the x, y and z
+    fields in their stored type, float32 for the camera's PLY files and for PCD, float64 for PLY
+    files written by Open3D. The view keeps the file mapped as long as it is referenced.
+
+    Raises:
+    - UnsupportedLayout: For ASCII or compressed files, or when x, y and z are not three adjacent
+      fields of the same type.
+
+    Returns:
+    - np.ndarray: (N, 3) read-only view of the points.
+    """
+    if path.endswith('.pcd'):
+        dtype, count, offset = _pcdLayout(path)
+    else:
+        dtype, count, offset = _plyLayout(path)
+
+    if not all(name in dtype.fields for name in 'xyz'):
+        raise UnsupportedLayout(f"{path} has no x, y and z fields.")
+    fieldType, xOffset = dtype.fields['x'][:2]
+    if (fieldType.kind != 'f' or dtype.fields['y'][:2] != (fieldType, xOffset + fieldType.itemsize)
+            or dtype.fields['z'][:2] != (fieldType, xOffset + 2 * fieldType.itemsize)):
+        raise UnsupportedLayout(f"x, y and z in {path} are not adjacent fields of one float type.")
+
+    if offset + count * dtype.itemsize > os.path.getsize(path):
+        raise UnsupportedLayout(f"{path} is shorter than its header says.")
+    if count == 0:
+        return np.zeros((0, 3), dtype=fieldType)
+
+    records = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,))
+    return np.ndarray((count, 3), dtype=fieldType, buffer=records, offset=xOffset,
+                      strides=(dtype.itemsize, fieldType.itemsize))
+
+
+def readPoints(path):
+    """
+    Returns the points of a point cloud file as an (N, 3) array: the memory-mapped view of readXYZ
+    where the layout allows, otherwise the points Open3D reads (float64, empty for missing or
+    unreadable files).
+    """
+    try:
+        return readXYZ(path)
+    except (ValueError, OSError):
+        import open3d as o3d
+
+        return np.asarray(o3d.io.read_point_cloud(path).points)
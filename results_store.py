@@ -0,0 +1,236 @@
+import json
+import os
+import numpy as np
+
+# File layout: magic, format version, size of the reserved JSON header, the JSON header (field
+# layout and run metadata, padded with spaces), then one fixed-width record per frame.
+MAGIC = b"LASERRES"
+FORMAT_VERSION = 1
+PREAMBLE_SIZE = len(MAGIC) + 8
+HEADER_RESERVE = 4096
+
+# Per-frame fields of a test's results: extents in meters, scaled extents in cm, times in seconds
+RESULT_FIELDS = [
+    ('timestamp', '<f8'),
+    ('normal', '<f8', (3,)),
+    ('extent', '<f8', (3,)),
+    ('scaled_extent_cm', '<f8', (3,)),
+    ('mean_z', '<f8'),
+    ('angular_velocity', '<f8'),  # From the previous valid frame to this one, NaN for the first frame
+    ('valid', '?'),  # Used in the run's averages and RPM, see folder_processor.processFolder
+    ('quality', '<f8'),  # See frame_quality.FrameQualityScorer
+]
+
+
+def _jsonDefault(value):
+    # NumPy scalars and arrays in the metadata
+    if isinstance(value, (np.generic, np.ndarray)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _dtypeFromDescr(descr):
+    # JSON turns the descr tuples and subarray shapes into lists
+    return np.dtype([(name, fmt, tuple(shape[0])) if shape else (name, fmt) for name, fmt, *shape in descr])
+
+
+class ResultsStore:
+    """
+    Single-file binary store for all per-frame results of one test plus its run metadata.
+
+    Frames are fixed-width records after a small JSON header, so the file is memory-mapped as a
+    NumPy structured array: reading a frame range or a single field touches only that data, and
+    appending frames only writes the new records at the end of the file.
+
+    Open an existing file with ResultsStore(path), create one with ResultsStore.create(path, ...).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            preamble = file.read(PREAMBLE_SIZE)
+            if len(preamble) < PREAMBLE_SIZE or preamble[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a LASER results file.")
+            version = int.from_bytes(preamble[len(MAGIC):len(MAGIC) + 4], 'little')
+            if version != FORMAT_VERSION:
+                raise ValueError(f"{path} has results format version {version}, expected {FORMAT_VERSION}.")
+            self._headerSize = int.from_bytes(preamble[len(MAGIC) + 4:], 'little')
+            header = json.loads(file.read(self._headerSize).decode('utf-8'))
+
+        self.dtype = _dtypeFromDescr(header['fields'])
+        self.metadata = header['metadata']
+        self.offset = PREAMBLE_SIZE + self._headerSize
+
+    @classmethod
+    def create(cls, path, metadata=None, fields=RESULT_FIELDS):
+        """
+        Creates an empty results file, replacing any existing one.
+
+        Parameters:
+        - path (str): Path of the results file.
+        - metadata (dict, optional): JSON-serialisable run metadata.
+        - fields (list): NumPy structured dtype description of the per-frame record.
+        """
+        dtype = np.dtype(fields)
+        header = cls._encodeHeader(dtype, metadata or {}, HEADER_RESERVE)
+        with open(path, 'wb') as file:
+            file.write(MAGIC + FORMAT_VERSION.to_bytes(4, 'little') + len(header).to_bytes(4, 'little'))
+            file.write(header)
+        return cls(path)
+
+    @staticmethod
+    def _encodeHeader(dtype, metadata, minimumSize):
+        header = json.dumps({'fields': dtype.descr, 'metadata': metadata}, default=_jsonDefault).encode('utf-8')
+        # Keep the records aligned and leave room for metadata updates in place
+        size = max(minimumSize, -(-len(header) // HEADER_RESERVE) * HEADER_RESERVE)
+        return header.ljust(size, b" ")
+
+    def __len__(self):
+        # A record cut short by an interrupted append is ignored
+        return (os.path.getsize(self.path) - self.offset) // self.dtype.itemsize
+
+    def append(self, **columns):
+        """
+        Appends frames. Every keyword is a field name with one value per new frame; fields that are
+        not given are filled with NaN.
+
+        Returns:
+        - int: Number of frames in the store after appending.
+        """
+        numFrames = len(next(iter(columns.values()))) if columns else 0
+        records = np.full(numFrames, np.nan, dtype=self.dtype)
+        for name, values in columns.items():
+            records[name] = values
+
+        with open(self.path, 'r+b') as file:
+            # Start at the end of the last complete record, dropping a partial one
+            file.seek(self.offset + len(self) * self.dtype.itemsize)
+            file.write(records.tobytes())
+            file.truncate()
+        return len(self)
+
+    def write(self, start, **columns):
+        """
+        Overwrites fields of stored frames, from frame start on, e.g. values that are only known once
+        all frames are in. Every keyword is a field name with one value per frame.
+        """
+        numFrames = len(next(iter(columns.values()))) if columns else 0
+        if numFrames == 0:
+            return
+        if start + numFrames > len(self):
+            raise IndexError(f"Frames {start} to {start + numFrames} are not all in {self.path}.")
+        records = np.memmap(self.path, dtype=self.dtype, mode='r+',
+                            offset=self.offset + start * self.dtype.itemsize, shape=(numFrames,))
+        for name, values in columns.items():
+            records[name] = values
+        records.flush()
+
+    def read(self, fields=None, start=None, stop=None):
+        """
+        Memory-maps the stored frames without reading them.
+
+        Parameters:
+        - fields (str or list, optional): A single field name returns that field's array, a list
+          returns a structured view with those fields, None returns all fields.
+        - start, stop (int, optional): Frame range to map.
+
+        Returns:
+        - np.memmap (read-only) view of the requested data.
+        """
+        numFrames = len(self)
+        start, stop, _ = slice(start, stop).indices(numFrames)
+        if stop <= start:
+            records = np.zeros(0, dtype=self.dtype)
+        else:
+            records = np.memmap(self.path, dtype=self.dtype, mode='r',
+                                offset=self.offset + start * self.dtype.itemsize, shape=(stop - start,))
+        if fields is None:
+            return records
+        return records[fields]
+
+    def updateMetadata(self, **metadata):
+        """
+        Merges new entries into the run metadata. The header is rewritten in place while it fits
+        the reserved space; otherwise the file is rewritten once with a larger header.
+        """
+        self.metadata.update(metadata)
+        header = self._encodeHeader(self.dtype, self.metadata, self._headerSize)
+
+        if len(header) == self._headerSize:
+            with open(self.path, 'r+b') as file:
+                file.seek(PREAMBLE_SIZE)
+                file.write(header)
+            return
+
+        records = np.array(self.read())
+        tempPath = self.path + ".tmp"
+        with open(tempPath, 'wb') as file:
+            file.write(MAGIC + FORMAT_VERSION.to_bytes(4, 'little') + len(header).to_bytes(4, 'little'))
+            file.write(header)
+            file.write(records.tobytes())
+        os.replace(tempPath, self.path)
+        self._headerSize = len(header)
+        self.offset = PREAMBLE_SIZE + self._headerSize
+
+
+def runSummary(results):
+    """
+    Run-level values of a processFolder result, as stored in the results file metadata.
+    """
+    return {
+        'rpm': results['rpm'],
+        'scaled_dimensions_cm': results['scaled_dimensions_cm'],
+        'overall_average_z': results['overall_average_z'],
+        'filtered_y_average': results['filtered_y_average'],
+    }
+
+
+def saveResults(path, results, timestamps, metadata=None):
+    """
+    Writes the output of processFolder for one test into a new results file.
+
+    Parameters:
+    - path (str): Path of the results file.
+    - results (dict): The dict returned by processFolder.
+    - timestamps (array): Frame timestamps in seconds.
+    - metadata (dict, optional): Extra run metadata, e.g. the test number and input folders.
+
+    Returns:
+    - ResultsStore: The new store.
+    """
+    runMetadata = runSummary(results)
+    runMetadata.update(metadata or {})
+
+    store = ResultsStore.create(path, runMetadata)
+    numFrames = len(results['normal_vectors'])
+
+    angular_velocities = np.full(numFrames, np.nan)
+    angular_velocities[1:len(results['angular_velocities']) + 1] = results['angular_velocities']
+    frameTimestamps = np.full(numFrames, np.nan)
+    frameTimestamps[:min(numFrames, len(timestamps))] = np.asarray(timestamps)[:numFrames]
+
+    store.append(
+        timestamp=frameTimestamps,
+        normal=results['normal_vectors'],
+        extent=results['bounding_boxes'],
+        scaled_extent_cm=results['scaled_bounding_boxes'],
+        mean_z=results['average_z_values'],
+        angular_velocity=angular_velocities,
+        valid=results.get('valid', np.ones(numFrames, dtype=bool)),  # NaN would read as True
+        quality=results.get('quality', np.full(numFrames, np.nan)),
+    )
+    return store
+
+
+def loadResults(paths, fields=None):
+    """
+    Memory-maps the results of many tests at once for combined analysis.
+
+    Returns:
+    - dict mapping each path to (metadata, memory-mapped data), see ResultsStore.read.
+    """
+    loaded = {}
+    for path in paths:
+        store = ResultsStore(path)
+        loaded[path] = (store.metadata, store.read(fields))
+    return loaded
@@ -1,55 +1,404 @@
 import numpy as np
-from scipy import stats
 
-def get_plane_normal(pcd):
+def fit_plane(pcd, distance_threshold=0.01, num_iterations=1000):
     """
-    Extracts the normal vector of the largest plane in a given point cloud.
+    Fits the largest plane in a point cloud with RANSAC.
+
+    Returns:
+    - plane_model (np.array): Plane coefficients [a, b, c, d] with ax + by + cz + d = 0.
+    - inlier_ratio (float): Fraction of the cloud's points within distance_threshold of the plane.
     """
-    plane_model, inliers = pcd.segment_plane(distance_threshold=0.01,
+    plane_model, inliers = pcd.segment_plane(distance_threshold=distance_threshold,
                                              ransac_n=3,
-                                             num_iterations=1000)
-    a, b, c, d = plane_model
-    normal_vector = np.array([a, b, c])
+                                             num_iterations=num_iterations)
+    return np.asarray(plane_model), len(inliers) / len(pcd.points)
+
+
+def refine_plane(pcd, previous_model, search_band=0.05, distance_threshold=0.01, num_iterations=100):
+    """
+    Re-fits a plane that is expected close to previous_model, e.g. the same face one frame later.
+    Only points within search_band of the previous plane are searched, so far fewer RANSAC
+    iterations are needed than for a fit over the whole cloud.
+
+    Returns:
+    - plane_model (np.array or None): Plane coefficients, None if too few points are near the old plane.
+    - inlier_ratio (float): Fraction of the whole cloud's points that are inliers of the new plane.
+    """
+    points = np.asarray(pcd.points)
+    distances = np.abs(points @ previous_model[:3] + previous_model[3])
+    near = np.flatnonzero(distances <= search_band)
+    if len(near) < 3:
+        return None, 0.0
+
+    plane_model, inliers = pcd.select_by_index(near).segment_plane(distance_threshold=distance_threshold,
+                                                                   ransac_n=3,
+                                                                   num_iterations=num_iterations)
+    return np.asarray(plane_model), len(inliers) / len(points)
+
+
+def least_squares_plane(points):
+    """
+    Least-squares plane through a set of points: the normal is the direction of least variance,
+    i.e. the smallest eigenvector of the 3x3 scatter matrix (the same result as an SVD of the
+    centered points, at a fraction of the cost for large clouds).
+
+    Returns:
+    - np.array: Plane coefficients [a, b, c, d] with a unit normal.
+    """
+    centroid = points.mean(axis=0)
+    centered = points - centroid
+    _, eigenvectors = np.linalg.eigh(centered.T @ centered)
+    normal = eigenvectors[:, 0]  # eigh sorts the eigenvalues in ascending order
+    return np.append(normal, -normal @ centroid)
+
+
+def fit_plane_fast(pcd, distance_threshold=0.01, num_iterations=1000, sample_size=5000, min_inlier_ratio=None,
+                   confidence=0.999, refine=True, seed=None, batch_size=64):
+    """
+    Bounded-cost alternative to fit_plane. RANSAC hypotheses are scored on a random subsample of
+    the cloud, many at a time, and the search stops early:
+    - once the standard adaptive bound says the best plane so far is found with the given
+      confidence (log(1 - confidence) / log(1 - w^3) iterations for inlier ratio w), or
+    - as soon as a plane reaches min_inlier_ratio, if given.
+    The best plane is then re-fitted by least squares to its inliers in the full cloud, which
+    recovers most of the accuracy lost to the subsample.
+
+    The normal is oriented towards the camera (positive d), so consecutive frames do not flip sign.
+
+    Parameters:
+    - pcd (o3d.geometry.PointCloud or np.array): The cloud, or its (N, 3) points.
+    - distance_threshold (float): Inlier distance in meters.
+    - num_iterations (int): Upper bound on the number of RANSAC hypotheses.
+    - sample_size (int): Points used to score hypotheses, the whole cloud if it is smaller.
+    - min_inlier_ratio (float, optional): Stop as soon as a plane has this fraction of the subsample.
+    - confidence (float): Probability of having found the best plane before stopping early.
+    - refine (bool): Least-squares refit on the inliers of the full cloud.
+    - seed (int, optional): Seed for the subsample and the hypotheses.
+    - batch_size (int): Hypotheses scored per vectorized batch.
+
+    Returns:
+    - plane_model (np.array): Plane coefficients [a, b, c, d] with ax + by + cz + d = 0.
+    - inlier_ratio (float): Fraction of the cloud's points within distance_threshold of the plane.
+    """
+    points = np.asarray(pcd.points) if hasattr(pcd, 'points') else np.asarray(pcd, dtype=float)
+    if len(points) < 3:
+        raise ValueError("At least 3 points are needed to fit a plane.")
+
+    rng = np.random.default_rng(seed)
+    sample = points[rng.choice(len(points), sample_size, replace=False)] if len(points) > sample_size else points
+
+    best_model = None
+    best_count = 0
+    required_iterations = num_iterations
+    iterations = 0
+    while iterations < min(num_iterations, required_iterations):
+        # Plane through three random points per hypothesis, degenerate (collinear) triples dropped
+        batch = min(batch_size, num_iterations - iterations)
+        iterations += batch
+        p0, p1, p2 = sample[rng.integers(0, len(sample), size=(3, batch))]
+        normals = np.cross(p1 - p0, p2 - p0)
+        lengths = np.linalg.norm(normals, axis=1)
+        valid = lengths > 1e-12
+        if not valid.any():
+            continue
+        normals = normals[valid] / lengths[valid, None]
+        offsets = -np.einsum('ij,ij->i', normals, p0[valid])
+
+        counts = np.count_nonzero(np.abs(sample @ normals.T + offsets) <= distance_threshold, axis=0)
+        best = np.argmax(counts)
+        if counts[best] > best_count:
+            best_count = counts[best]
+            best_model = np.append(normals[best], offsets[best])
+            inlier_ratio = best_count / len(sample)
+            if min_inlier_ratio is not None and inlier_ratio >= min_inlier_ratio:
+                break
+            if inlier_ratio < 1.0:
+                required_iterations = np.log(1 - confidence) / np.log1p(-inlier_ratio ** 3)
+            else:
+                break
+
+    if best_model is None:
+        raise ValueError("All sampled points are collinear, no plane can be fitted.")
+
+    inliers = np.abs(points @ best_model[:3] + best_model[3]) <= distance_threshold
+    if refine and np.count_nonzero(inliers) >= 3:
+        best_model = least_squares_plane(points[inliers])
+        inliers = np.abs(points @ best_model[:3] + best_model[3]) <= distance_threshold
+
+    if best_model[3] < 0:
+        best_model = -best_model  # Same plane, normal towards the camera at the origin
+    return best_model, np.count_nonzero(inliers) / len(points)
+
+
+def plane_normal(plane_model):
+    """
+    Returns the unit normal vector of a plane model [a, b, c, d].
+    """
+    normal_vector = np.array(plane_model[:3], dtype=float)
     normal_vector /= np.linalg.norm(normal_vector)  # Normalize the vector
     return normal_vector
 
-def calculate_rpm(normal_vectors, timestamps, precision=2):
+
+def get_plane_normal(pcd, method="ransac", seed=None, **options):
+    """
+    Extracts the normal vector of the largest plane in a given point cloud.
+
+    Parameters:
+    - method (str): "ransac" for Open3D's segment_plane over the whole cloud (fit_plane), "fast"
+      for the subsampled, early-stopping RANSAC with least-squares refinement (fit_plane_fast).
+    - seed (int, optional): Seed for the "fast" method. "ransac" uses Open3D's global seed.
+    - options: Passed on to the estimator, e.g. num_iterations or sample_size.
+    """
+    if method == "ransac":
+        plane_model, _ = fit_plane(pcd, **options)
+    elif method == "fast":
+        plane_model, _ = fit_plane_fast(pcd, seed=seed, **options)
+    else:
+        raise ValueError(f"Unknown plane estimation method: {method}")
+    return plane_normal(plane_model)
+
+def angular_velocities_from_normals(normal_vectors, timestamps):
+    """
+    Angular velocities (radians per second) between consecutive normal vectors, for whole arrays.
+    - normal_vectors: Nx3 array (or list) of unit normal vectors.
+    - timestamps: Timestamps in seconds, at least N of them.
+
+    Returns:
+    - np.array of N - 1 angular velocities, 0 where the time difference is not positive.
+    """
+    normals = np.asarray(normal_vectors, dtype=float).reshape(-1, 3)
+    timestamps = np.asarray(timestamps, dtype=float)[:len(normals)]
+
+    # Angle between consecutive normal vectors, dot products clamped for numerical stability
+    cos_theta = np.clip(np.einsum('ij,ij->i', normals[:-1], normals[1:]), -1.0, 1.0)
+    angles = np.arccos(cos_theta)
+
+    time_diff = np.diff(timestamps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(time_diff > 0, angles / time_diff, 0.0)
+
+
+def rpm_from_angular_velocity(angular_velocity):
+    """
+    Converts an angular velocity in radians per second to revolutions per minute.
+    """
+    return (angular_velocity * 60) / (2 * np.pi)
+
+
+def calculate_rpm(normal_vectors, timestamps, precision=2, valid=None):
     """
     Calculate rotations per minute (RPM) from normal vectors and timestamps.
     - normal_vectors: List of normal vectors (Nx3 array).
     - timestamps: List of timestamps corresponding to the normal vectors.
     - precision: Rounding precision for angular velocities.
+    - valid: Optional boolean mask of the frames to use. Velocities are then taken between
+      consecutive valid frames, skipping the invalid ones in between.
 
     Returns:
     - RPM value.
-    - angular_velocities: List of angular velocities (radians per second).
+    - angular_velocities: Array of angular velocities (radians per second). Entry i is the velocity
+      into frame i + 1; with a mask it is NaN where frame i + 1 is invalid or has no valid frame before it.
     """
-    angular_velocities = []
-
-    for i in range(len(normal_vectors) - 1):
-        # Calculate the angle between consecutive normal vectors
-        n1 = normal_vectors[i]
-        n2 = normal_vectors[i + 1]
-        cos_theta = np.clip(np.dot(n1, n2), -1.0, 1.0)  # Dot product and clamp for numerical stability
-        angle = np.arccos(cos_theta)  # Angle in radians
-
-        # Time difference between consecutive frames
-        time_diff = timestamps[i + 1] - timestamps[i]
-
-        # Angular velocity in radians per second
-        angular_velocity = angle / time_diff if time_diff > 0 else 0
-        angular_velocities.append(angular_velocity)
-
-    # Round angular velocities to handle "close enough" values
-    rounded_angular_velocities = [round(val, precision) for val in angular_velocities]
+    if valid is None:
+        angular_velocities = angular_velocities_from_normals(normal_vectors, timestamps)
+    else:
+        normals = np.asarray(normal_vectors, dtype=float).reshape(-1, 3)
+        validIdx = np.flatnonzero(np.asarray(valid, dtype=bool)[:len(normals)])
+        validIdx = validIdx[validIdx < len(timestamps)]
+        angular_velocities = np.full(max(len(normals) - 1, 0), np.nan)
+        angular_velocities[validIdx[1:] - 1] = angular_velocities_from_normals(
+            normals[validIdx], np.asarray(timestamps, dtype=float)[validIdx])
 
-    # Calculate mode
-    if rounded_angular_velocities:
-        mode_result = stats.mode(rounded_angular_velocities)
-        mode_angular_velocity = np.atleast_1d(mode_result.mode)[0] if mode_result.mode.size > 0 else 0
+    # Round angular velocities to handle "close enough" values and take the most common one
+    # (the smallest on ties, like scipy.stats.mode)
+    measured = angular_velocities[np.isfinite(angular_velocities)]
+    if measured.size > 0:
+        values, counts = np.unique(np.round(measured, precision), return_counts=True)
+        mode_angular_velocity = values[np.argmax(counts)]
     else:
         mode_angular_velocity = 0
 
     # Convert to RPM (revolutions per minute)
-    rpm = (mode_angular_velocity * 60) / (2 * np.pi)
+    rpm = rpm_from_angular_velocity(mode_angular_velocity)
     return rpm, angular_velocities
+
+
+class RPMEstimator:
+    """
+    Incremental version of calculate_rpm for frames that arrive one at a time.
+
+    Each update costs O(1): the rounded angular velocities are counted in a histogram with one bin
+    per rounding step, and the mode is kept up to date as bins are incremented. The result matches
+    calculate_rpm over all frames seen so far.
+    """
+
+    def __init__(self, precision=2):
+        self.scale = 10 ** precision
+        self.histogram = {}
+        self.mode_bin = None
+        self.mode_count = 0
+        self.previous_normal = None
+        self.previous_timestamp = None
+
+    def update(self, normal_vector, timestamp):
+        """
+        Adds the next frame's normal vector and timestamp.
+
+        Returns:
+        - The angular velocity to the previous frame (radians per second), None for the first frame.
+        """
+        normal_vector = np.asarray(normal_vector, dtype=float)
+        angular_velocity = None
+
+        if self.previous_normal is not None:
+            angle = np.arccos(np.clip(np.dot(self.previous_normal, normal_vector), -1.0, 1.0))
+            time_diff = timestamp - self.previous_timestamp
+            angular_velocity = angle / time_diff if time_diff > 0 else 0.0
+
+            bin_index = int(np.rint(angular_velocity * self.scale))
+            count = self.histogram.get(bin_index, 0) + 1
+            self.histogram[bin_index] = count
+            if count > self.mode_count or (count == self.mode_count and bin_index < self.mode_bin):
+                self.mode_bin, self.mode_count = bin_index, count
+
+        self.previous_normal = normal_vector
+        self.previous_timestamp = timestamp
+        return angular_velocity
+
+    @property
+    def rpm(self):
+        """
+        RPM from the most common rounded angular velocity so far, 0 before the second frame.
+        """
+        if self.mode_bin is None:
+            return 0.0
+        return rpm_from_angular_velocity(self.mode_bin / self.scale)
+
+
+def series_extrema(series):
+    """
+    Indices of the local maxima and minima of a 1-D series, like scipy.signal.find_peaks without
+    conditions: flat peaks count once, at their middle, and the first and last samples never count.
+    Works on memory-mapped arrays; NaN samples are never extrema nor next to one.
+
+    Returns:
+    - maxima, minima (np.array): Sample indices in increasing order.
+    """
+    values = np.asarray(series, dtype=float)
+    if len(values) < 3:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    # Collapse runs of equal values, so a plateau compares with the values around it as one sample
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    ends = np.r_[starts[1:], len(values)] - 1
+    runs = values[starts]
+    middles = (starts[1:-1] + ends[1:-1]) // 2
+    inner = runs[1:-1]
+    maxima = middles[(inner > runs[:-2]) & (inner > runs[2:])]
+    minima = middles[(inner < runs[:-2]) & (inner < runs[2:])]
+    return maxima, minima
+
+
+def _half_periods(series, timestamps):
+    # Time between consecutive maxima and between consecutive minima, each half a revolution for a
+    # box's projected area (two faces pass per turn), with the time each interval ends
+    timestamps = np.asarray(timestamps, dtype=float)
+    maxima, minima = series_extrema(series)
+    intervals = []
+    for extrema in (maxima, minima):
+        times = timestamps[extrema]
+        durations = np.diff(times)
+        valid = durations > 0
+        intervals.append((times[1:][valid], durations[valid]))
+    return intervals
+
+
+def mean_peak_rpm(series, timestamps):
+    """
+    Single RPM estimate of a whole series from the mean time between its maxima and between its
+    minima (testRotfinder.rotfinder). Returns 0 if the series has fewer than two maxima and minima.
+    """
+    means = [durations.mean() for _, durations in _half_periods(series, timestamps) if len(durations)]
+    if not means:
+        return 0.0
+    return 60 / (2 * np.mean(means))
+
+
+def peak_rpm(series, timestamps, window=None, step=None):
+    """
+    RPM over time from the peaks of a periodic series, e.g. the projected area or an extent of the
+    rotating box, or the absolute Z component of its face normal (two peaks per revolution).
+
+    Everything is computed with array operations on the extrema only, so multi-hour series and
+    memory-mapped ones (e.g. a ResultsStore field) are cheap.
+
+    Parameters:
+    - series (array): The periodic signal, one value per frame.
+    - timestamps (array): Frame timestamps in seconds, at least as many as series values.
+    - window (float, optional): Length in seconds of a sliding window. Each window's RPM is
+      computed as in mean_peak_rpm from the intervals that end inside it. None gives the RPM of
+      every single peak-to-peak interval instead.
+    - step (float, optional): Seconds between window ends, window / 2 by default.
+
+    Returns:
+    - times (np.array): End time of each window, or of each interval, in seconds.
+    - rpm (np.array): RPM at those times, NaN for windows without any complete interval.
+    """
+    intervals = _half_periods(series, timestamps)
+
+    if window is None:
+        times = np.concatenate([ends for ends, _ in intervals])
+        durations = np.concatenate([durations for _, durations in intervals])
+        order = np.argsort(times, kind='stable')
+        return times[order], 60 / (2 * durations[order])
+
+    timestamps = np.asarray(timestamps, dtype=float)[:len(series)]
+    if len(timestamps) == 0:
+        return np.zeros(0), np.zeros(0)
+    step = step or window / 2
+    windowEnds = np.arange(timestamps[0] + window, timestamps[-1], step)
+    windowEnds = np.r_[windowEnds, timestamps[-1]]  # The last window always ends at the last frame
+
+    # Mean interval per window from cumulative sums, for the maxima and the minima separately
+    means = []
+    for ends, durations in intervals:
+        cumulative = np.r_[0.0, np.cumsum(durations)]
+        last = np.searchsorted(ends, windowEnds, side='right')
+        first = np.searchsorted(ends, windowEnds - window, side='right')
+        counts = last - first
+        with np.errstate(divide='ignore', invalid='ignore'):
+            means.append(np.where(counts > 0, (cumulative[last] - cumulative[first]) / counts, np.nan))
+
+    means = np.array(means)
+    available = np.count_nonzero(~np.isnan(means), axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        halfPeriod = np.where(available > 0, np.nansum(means, axis=0) / available, np.nan)
+    return windowEnds, 60 / (2 * halfPeriod)
+
+
+def cross_check_rpm(normal_vectors, timestamps, series=None, tolerance=0.05):
+    """
+    Compares calculate_rpm with the peak-based estimate of the same run.
+
+    Parameters:
+    - normal_vectors (array): Per-frame plane normals, as for calculate_rpm.
+    - timestamps (array): Frame timestamps in seconds.
+    - series (array, optional): Periodic signal for the peak estimate, e.g. the projected areas.
+      Defaults to the absolute Z component of the normals, which peaks twice per revolution.
+    - tolerance (float): Largest relative difference at which the two estimates agree.
+
+    Returns:
+    - dict with both RPMs, their relative difference and whether they agree.
+    """
+    normals = np.asarray(normal_vectors, dtype=float).reshape(-1, 3)
+    if series is None:
+        series = np.abs(normals[:, 2])
+    modeRpm, _ = calculate_rpm(normals, timestamps)
+    peakRpm = mean_peak_rpm(series, timestamps)
+    difference = abs(modeRpm - peakRpm) / peakRpm if peakRpm else float('inf')
+    return {
+        'calculate_rpm': float(modeRpm),
+        'peak_rpm': float(peakRpm),
+        'relative_difference': float(difference),
+        'agree': bool(difference <= tolerance),
+    }
@@ -1,17 +1,30 @@
+import os
+import sys
 import numpy as np
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from results_store import ResultsStore
+
 # Set print options to display everything
 np.set_printoptions(threshold=np.inf)
 
-# Load the .npy file
+# Load the .npy file, or a results.laser file written by main.py
 file_path = '/Users/lukebray/PycharmProjects/LASER2/OutputPCD/Test2/angular_velocities.npy'  # Replace with your file path
-data = np.load(file_path)
+
+if file_path.endswith(".laser"):
+    store = ResultsStore(file_path)
+    print("Run metadata:")
+    for key, value in store.metadata.items():
+        print(f"  {key}: {value}")
+    data = store.read()
+else:
+    data = np.load(file_path)
 
 # Print the full array
-print("Full contents of the .npy file:")
+print("Full contents of the file:")
 print(data)
 
 
 # Check the shape and data type
 print("\nShape of the array:", data.shape)
-print("Data type of the array:", data.dtype)
\ No newline at end of file
+print("Data type of the array:", data.dtype)